@@ -0,0 +1,208 @@
+# Frame throughput benchmarks for sajilopygame, run headless
+# run with: python benchmarks/frame_benchmarks.py [--frames 600] [--json results.json] [scenario ...]
+#
+# every scenario builds a scene and returns a function that draws and
+# updates one frame; each scenario is timed once, then run again under
+# tracemalloc to count the memory allocated per frame
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "libraries"))
+
+from sajilopygame import sajilopygame
+
+ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "libraries", "sajilopython", "assets")
+CHARACTERS = os.path.join(ASSETS, "characters")
+SOUNDS = os.path.join(ASSETS, "sounds")
+
+
+# N characters bouncing between the window edges
+def bouncing(game, count=1000):
+    for i in range(count):
+        game.create_entity(os.path.join(CHARACTERS, "apple_small.png"), org=(random.randint(0, 700), random.randint(0, 500)), tag="ball")
+
+    def frame():
+        game.background_color((0, 0, 0))
+        game.bounce_left_right(type="ball", speed=3)
+        game.bound_to_window(type="ball")
+        game.load_entities(tag="ball")
+        game.refresh_window()
+    return frame
+
+
+# the trigger key pressed on every frame
+def trigger_spam(game):
+    game.create_player(os.path.join(CHARACTERS, "spaceship.png"))
+    game.create_object(os.path.join(CHARACTERS, "bullet_small.png"))
+    game.load_sound(os.path.join(SOUNDS, "laser.mp3"), type="trigger")
+
+    def frame():
+        game.background_color((0, 0, 0))
+        game.assign_trigger(type="object", start_pos=(game.playerx, game.playery), dir="b2t", speed=10)
+        game.trigger_pressed = True
+        game.load_player()
+        game.load_object()
+        game.refresh_window()
+    return frame
+
+
+# many characters crowded into a small area of a collision world
+def collision_storm(game, count=400):
+    world = game.collision_world(cell_size=32)
+    characters = []
+    for i in range(count):
+        character = game.character(game, org=(random.randint(200, 500), random.randint(150, 400)), width=12, height=12)
+        world.add(character)
+        characters.append(character)
+    hits = []
+    world.on_enter(lambda obj1, obj2: hits.append(obj1))
+
+    def frame():
+        game.background_color((0, 0, 0))
+        for character in characters:
+            character.xpos += random.randint(-2, 2)
+            character.ypos += random.randint(-2, 2)
+            character.load()
+        game.refresh_window()
+        hits.clear()
+    return frame
+
+
+# lots of text on the screen, some of it changing every frame
+def hud_heavy(game, lines=30):
+    frames = [0]
+
+    def frame():
+        frames[0] += 1
+        game.background_color((0, 0, 0))
+        game.display_score()
+        game.display_lives()
+        for line in range(lines):
+            game.draw_text("line %d : %d" % (line, frames[0] // 10), xpos=400, ypos=line * 20)
+        game.refresh_window()
+    return frame
+
+
+# a fountain keeping about 10000 particles alive
+def particles(game, count=10000):
+    fountain = game.create_particles(capacity=count, gravity=0.05, mode="point")
+
+    def frame():
+        game.background_color((0, 0, 0))
+        fountain.emit(400, 500, count=count // 60, speed=6, angle=90, spread=60, life=60, color=(255, 160, 40), color_jitter=40)
+        game.load_particles()
+        game.refresh_window()
+    return frame
+
+
+# a 200x100 tile world scrolled under the camera
+def scrolling_tilemap(game, columns=200, rows=100):
+    grid = [[random.choice((0, 1, 2)) for column in range(columns)] for row in range(rows)]
+    tilemap = game.load_tilemap(grid, tiles={1: (40, 120, 40), 2: os.path.join(CHARACTERS, "apple_small.png")})
+    game.create_camera(bounds=tilemap.size())
+
+    def frame():
+        game.background_color((0, 0, 0))
+        game.camera.move(4, 1)
+        game.draw_tilemap(tilemap)
+        game.refresh_window()
+    return frame
+
+
+# a crowd of small sprites drawn from an atlas with one blits call
+def atlas_crowd(game, count=3000):
+    atlas = game.load_atlas(CHARACTERS)
+    names = [name for name in atlas.index if "small" in name]
+    sprites = [[random.choice(names), (random.randint(0, 780), random.randint(0, 580))] for i in range(count)]
+
+    def frame():
+        game.background_color((0, 0, 0))
+        for sprite in sprites:
+            xpos, ypos = sprite[1]
+            sprite[1] = ((xpos + 1) % 800, ypos)
+        game.draw_sprites(atlas, sprites)
+        game.refresh_window()
+    return frame
+
+
+SCENARIOS = {
+    "bouncing": bouncing,
+    "trigger_spam": trigger_spam,
+    "collision_storm": collision_storm,
+    "hud_heavy": hud_heavy,
+    "particles": particles,
+    "scrolling_tilemap": scrolling_tilemap,
+    "atlas_crowd": atlas_crowd,
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def measure(name, frames):
+    random.seed(0)
+    game = sajilopygame(headless=True)
+    frame = SCENARIOS[name](game)
+    for i in range(min(30, frames)):     # warming up the caches
+        frame()
+
+    frame_times = []
+    start = time.perf_counter()
+    for i in range(frames):
+        frame_start = time.perf_counter()
+        frame()
+        frame_times.append((time.perf_counter() - frame_start) * 1000)
+    total = time.perf_counter() - start
+
+    # allocations are counted separately as tracemalloc slows everything down
+    allocated = 0
+    tracemalloc.start()
+    for i in range(min(100, frames)):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        frame()
+        allocated += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    return {
+        "scenario": name,
+        "frames": frames,
+        "fps": frames / total,
+        "p50_ms": percentile(frame_times, 0.50),
+        "p99_ms": percentile(frame_times, 0.99),
+        "alloc_kib_per_frame": allocated / min(100, frames) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sajilopygame frame benchmarks")
+    parser.add_argument("scenarios", nargs="*", help="any of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error("unknown scenario: " + name)
+
+    results = []
+    print("%-16s %10s %10s %10s %14s" % ("scenario", "fps", "p50 ms", "p99 ms", "alloc KiB/fr"))
+    for name in args.scenarios or SCENARIOS:
+        result = measure(name, args.frames)
+        results.append(result)
+        print("%-16s %10.1f %10.3f %10.3f %14.1f" % (name, result["fps"], result["p50_ms"], result["p99_ms"], result["alloc_kib_per_frame"]))
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
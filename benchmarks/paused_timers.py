@@ -0,0 +1,52 @@
+# Check: timers do not count the time the game spends paused.
+# a timer that fires every 0.5 s should not catch up with a burst of calls
+# on the first frame after a one minute pause
+# run with: python benchmarks/paused_timers.py
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "libraries"))
+
+from sajilopygame import sajilopygame
+
+PAUSE_SECONDS = 60
+
+
+def main():
+    game = sajilopygame(headless=True)
+    calls = []
+    game.every(0.5, lambda: calls.append(game.now()))
+
+    for frame in range(60):         # one second of play
+        game.refresh_window()
+    before = len(calls)
+
+    game.pause()
+    for frame in range(PAUSE_SECONDS * game.fps):
+        game.idle_scene()
+    paused = len(calls) - before
+    game.resume()
+
+    start = time.perf_counter()
+    game.refresh_window()
+    first_frame = (time.perf_counter() - start) * 1000
+    burst = len(calls) - before - paused
+
+    for frame in range(60):         # one more second of play
+        game.refresh_window()
+    after = len(calls) - before - paused - burst
+
+    print("calls before the pause      : %d" % before)
+    print("calls during the pause      : %d" % paused)
+    print("calls on the first frame    : %d (%.3f ms)" % (burst, first_frame))
+    print("calls in the next second    : %d" % after)
+    if paused or burst > 1 or not 1 <= after <= 2:
+        print("the timers counted the paused time")
+        sys.exit(1)
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
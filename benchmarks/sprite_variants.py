@@ -0,0 +1,64 @@
+# Benchmark: directional sprite images, looked up on disk every frame
+# versus the variants cached by create_player.
+# run with: python benchmarks/sprite_variants.py
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "libraries"))
+
+import pygame
+from sajilopygame import sajilopygame
+
+FRAMES = 2000
+CHARACTERS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "libraries", "sajilopython", "assets", "characters")
+
+
+# the per-frame lookup load_player used to do before the variants were cached
+def load_player_from_disk(game):
+    image_name_wo_ext, image_ext = os.path.splitext(game.player_image_path)
+    direction = game.pressed_direction()
+    image = game.player_img
+    if direction:
+        variant_path = image_name_wo_ext + "_" + direction + image_ext
+        if os.path.exists(variant_path):
+            image = pygame.image.load(variant_path)
+    game.screen.blit(image, (game.playerx, game.playery))
+
+
+def run(game, load):
+    directions = [(True, False, False, False), (False, True, True, False), (False, False, False, True)]
+    start = time.perf_counter()
+    for frame in range(FRAMES):
+        game.left_pressed, game.right_pressed, game.up_pressed, game.down_pressed = directions[frame % len(directions)]
+        game.background_color((0, 0, 0))
+        load(game)
+    return (time.perf_counter() - start) / FRAMES * 1000
+
+
+def main():
+    game = sajilopygame(headless=True)
+    with tempfile.TemporaryDirectory() as folder:
+        # a player with every directional image next to it
+        base = pygame.image.load(os.path.join(CHARACTERS, "maze_player_right.png"))
+        player_path = os.path.join(folder, "player.png")
+        pygame.image.save(base, player_path)
+        for direction in game.SPRITE_DIRECTIONS:
+            pygame.image.save(base, os.path.join(folder, "player_" + direction + ".png"))
+
+        game.create_player(player_path)
+        game.assign_lr_keys(type="player")
+
+        before = run(game, load_player_from_disk)
+        after = run(game, sajilopygame.load_player)
+    print("frames          : %d" % FRAMES)
+    print("disk lookup     : %.4f ms/frame" % before)
+    print("cached variants : %.4f ms/frame" % after)
+    print("speedup         : %.1fx" % (before / after))
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,32 +8,142 @@ robotics program.
 @ license: MIT
 """
 
+import atexit
+import csv
+import json
 import math
 import os
+import struct
+import sys
 import time
+import weakref
+import zlib
 
+import numpy as np
 import pygame
 import random
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pygame import mixer
 
+# used inside a script started with start_script: yield wait(0.5)
+def wait(seconds=0):
+    return seconds
+
+
+# a property that reads and writes the state of an input action
+# e.g. left_pressed is the "left" action
+def action_state(action):
+    def get(self):
+        return self.actions[action]
+
+    def set(self, value):
+        self.actions[action] = value
+
+    return property(get, set)
+
+
+# a property that reads and writes one field of a named entity
+# e.g. playerx is the "x" field of the "player" entity
+def entity_field(name, field):
+    def get(self):
+        return self.entities.value(self.named_entities[name], field)
+
+    def set(self, value):
+        self.entities.set_value(self.named_entities[name], field, value)
+
+    return property(get, set)
+
+
 class sajilopygame:
-    def __init__(self,wwidth=800,wheight=600):
+    # direction codes of triggers and projectiles as (x, y) directions
+    TRIGGER_DIRECTIONS = {"b2t": (0, -1), "t2b": (0, 1), "l2r": (1, 0), "r2l": (-1, 0)}
+
+    # suffixes of the directional images of a sprite
+    SPRITE_DIRECTIONS = ("left", "up_left", "down_left", "right", "up_right", "down_right", "up", "down")
+
+    # the settings file of the Sajilo Python Playground, and the files the asset loaders know
+    CONFIG_FILE = "sajilopython_workbench_config.json"
+    ATLAS_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
+    SOUND_EXTENSIONS = (".wav", ".mp3", ".ogg", ".flac")
+
+    # the keys every game starts with, and the actions that happen once per press instead of while held
+    DEFAULT_KEYS = {pygame.K_LEFT: "left", pygame.K_RIGHT: "right", pygame.K_UP: "up", pygame.K_DOWN: "down",
+                    pygame.K_SPACE: "trigger", pygame.K_p: "pause", pygame.K_r: "restart", pygame.K_ESCAPE: "quit"}
+    PRESS_ACTIONS = ("trigger", "pause", "restart", "quit")
+
+    # the arrow key states, kept in the action table
+    left_pressed, right_pressed = action_state("left"), action_state("right")
+    up_pressed, down_pressed = action_state("up"), action_state("down")
+
+    # the old player/enemy/object attributes, kept in the entity store
+    playerx, playery = entity_field("player", "x"), entity_field("player", "y")
+    player_width, player_height = entity_field("player", "width"), entity_field("player", "height")
+    last_detected_edge_player = entity_field("player", "edge")
+    enemyx, enemyy = entity_field("enemy", "x"), entity_field("enemy", "y")
+    enemy_width, enemy_height = entity_field("enemy", "width"), entity_field("enemy", "height")
+    last_detected_edge_enemy = entity_field("enemy", "edge")
+    objectx, objecty = entity_field("object", "x"), entity_field("object", "y")
+    object_width, object_height = entity_field("object", "width"), entity_field("object", "height")
+    last_detected_edge_object = entity_field("object", "edge")
+
+    # headless runs without a window (SDL dummy drivers) and without waiting
+    # between frames, for benchmarks and automated runs
+    # record: a file to save the input and the random seed of this session to
+    # replay: a recorded file, the session is played again headless at full speed
+    # (both can also be given in SAJILOPYTHON_RECORD and SAJILOPYTHON_REPLAY, to replay a script unchanged)
+    def __init__(self,wwidth=800,wheight=600,headless=False,record=None,replay=None):
         self.wwidth = wwidth
         self.wheight = wheight
+        record = record or os.environ.get("SAJILOPYTHON_RECORD")
+        replay = replay or os.environ.get("SAJILOPYTHON_REPLAY")
+        if replay:
+            headless = True
+        self.headless = headless
 
         # initializing pygame
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
         pygame.init()
         self.screen = pygame.display.set_mode((self.wwidth,self.wheight))
 
         # initializing time
-        self.clock = pygame.time.Clock()
+        self.clock = self.virtualclock() if headless else pygame.time.Clock()
         self.fps = 60
+        self.time_scale = 1     # 1 moves in pixels per frame, run() sets it to the step time
+        self.step_time = None
+        self.running = False
+
+        # recording and replaying: every part of a frame sees the same time, saved with the input
+        self.frame_now = None
+        self.recorder = None
+        self.replayer = None
+        if replay:
+            self.replayer = self.inputreplayer(replay)
+            self.frame_now = self.replayer.start
+            # the replay is checked when the program ends, however the script ends
+            atexit.register(self.finish_replay)
+        elif record:
+            self.frame_now = self.now()
+            self.recorder = self.inputrecorder(record, seed=int.from_bytes(os.urandom(4), "little"), start=self.frame_now)
+            atexit.register(self.stop_recording)
+
+        # input: key -> action table, the state of every action, and which entities the actions move
+        self.key_bindings = dict(self.DEFAULT_KEYS)
+        self.actions = dict.fromkeys(self.key_bindings.values(), False)
+        self.action_moves = []          # (action, type, dx, dy)
+        self.action_callbacks = {}
+        self.held_keys = []             # (key, action) of the actions that are polled
+        self.update_key_table()
+        self.joystick = None
+        self.joystick_deadzone = 0.3
+        self.joystick_buttons = {0: "trigger", 7: "pause"}
+        self.input_time = None          # when the last movement key was read
+        self.input_applied = None
+        self.input_latencies = deque(maxlen=240)
 
         # Movement states for keys
-        self.left_pressed = False
-        self.right_pressed = False
-        self.up_pressed = False
-        self.down_pressed = False
         self.trigger_pressed = False
 
         # Mappings
@@ -44,10 +154,15 @@ class sajilopygame:
         self.is_lr_mapped_to_object = False
         self.is_ud_mapped_to_object = False
 
-        # edge detection
-        self.last_detected_edge_player = None
-        self.last_detected_edge_enemy = None
-        self.last_detected_edge_object = None
+        # entities, the player, enemy and object are the first three
+        self.entities = self.entitystore()
+        self.named_entities = {}
+        for name in ("player", "enemy", "object"):
+            self.named_entities[name] = self.entities.spawn(tag=name)
+        self.image_cache = {}
+        self.asset_keys = {}        # path -> the absolute path it is cached under
+        if self.recorder is not None or self.replayer is not None:
+            self.seed_randomness((self.recorder or self.replayer).seed)
 
         # for assigning triggers
         self.selected_trigger_type = "object"
@@ -55,8 +170,13 @@ class sajilopygame:
         self.selected_trigger_speed = 1
         self.triggered_state = False
         self.end_trigger = False
+        self.projectiles = None
+
+        # effects
+        self.particle_systems = []
 
         # collisions
+        self.collision_worlds = []
         self.collision_state = False
         self.collision_type = "enemy"
         self.collision_effect = "disappear"
@@ -65,6 +185,7 @@ class sajilopygame:
         # limits
         self.random_ximit = (0,0)
         self.random_yimit = (0,0)
+        self.free_spaces = {}       # type -> the free places it can be moved to at random
 
         # sounds
         self.collision_sound_path = None
@@ -82,103 +203,348 @@ class sajilopygame:
         self.victory_sound_path = None
         self.victory_sound_volume = 0.5
         self.victory_sound_activated = False
+        self.background_sound = None
+        self.sound_bank = self.soundbank(now=self.now)
 
         # lives
         self.lives = 3
+        self.max_lives = 3
         self.game_over_state = False
 
+        # scenes: "playing", "paused", "game_over" or "won"
+        self.scene = "playing"
+        self.scene_surface = None
+        self.scene_started = None   # when play stopped, the timers do not count the time in a still scene
+        self.idle_wait = 100    # milliseconds to wait for events in a still scene
+        self.restart_callbacks = []
+        self.start_positions = {}
+
         # transformations
         self.player_transformed = False
+        self.enemy_transformed = False
+        self.object_transformed = False
+        self.rotation_steps = 360
+        self.transform_cache = self.lrucache(max_size=512)
+
+        # masks for pixel perfect collisions, dropped together with their image
+        self.mask_cache = weakref.WeakKeyDictionary()
+        self.filled_masks = {}      # size -> a filled mask, for shape characters
+        self.drawn_images = {}      # the image each named entity was last drawn with
 
         # files
         self.HIGH_SCORE_FILE = "high_score.txt"
 
+        # dirty rectangle rendering
+        self.dirty_rendering = False
+        self.dirty_threshold = 0.5
+        self.dirty_rects = []
+        self.erased_rects = []
+        self.full_redraw = False
+
+        # background layer
+        self.background_source = None
+        self.background_layer = None
+        self.background_items = {}
+        self.background_images = {}
+
+        # frame profiler
+        self.profiler = None
+
+        # timers and scripts
+        self.scheduler = self.timerwheel(start=self.now())
+
+        # physics world, made by enable_physics
+        self.physics = None
+        self.physics_clock = None
+
+        # scrolling: positions are in the world, the camera shows a part of it
+        self.camera = None
+
+        # texture atlases, many small images packed into a few big ones
+        self.atlases = {}
+
+        # decoded sounds by path, and the loader that decodes images and sounds in the background
+        self.sound_cache = {}
+        self.asset_loader = None
+
+        # sprite sheets cut into frames, and the animation of every entity or character
+        self.sprite_sheets = {}
+        self.animations = {}
+        self.animation_clock = None
+
+        # fonts and rendered texts
+        self.fonts = {}
+        self.text_cache = self.lrucache(max_size=256)
+
+        # rectangles of the characters drawn as surfaces, by color, size and border
+        self.shape_cache = self.lrucache(max_size=256)
+
     # function to update the display window
     # also is responsible for quitting the program
     def refresh_window(self):
+        if self.scene != "playing":
+            self.idle_scene()
+            return
+        profiler = self.profiler
+        if profiler:
+            profiler.mark("user")       # everything drawn since the last refresh
+            if profiler.overlay:
+                self.draw_profiler_overlay()
+                profiler.mark("overlay")
+
         # updating the window
-        pygame.display.update()
+        self.present()
+        if profiler:
+            profiler.mark("present")
 
         # Checking for window events
-        for event in pygame.event.get():
-            # If close button is pressed
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
-            # upon key presses
-            if event.type == pygame.KEYDOWN:
-                # If Esc button is pressed
-                if event.key == pygame.K_ESCAPE:
-                    pygame.quit()
-                    exit()
-                # Movement key pressed
-                if event.key == pygame.K_LEFT:
-                    self.left_pressed = True
-                if event.key == pygame.K_RIGHT:
-                    self.right_pressed = True
-                if event.key == pygame.K_UP:
-                    self.up_pressed = True
-                if event.key == pygame.K_DOWN:
-                    self.down_pressed = True
-                if event.key == pygame.K_SPACE:
-                    self.trigger_pressed = True
-
-            # Upon key release
-            if event.type == pygame.KEYUP:
-                if event.key == pygame.K_LEFT:
-                    self.left_pressed = False
-                if event.key == pygame.K_RIGHT:
-                    self.right_pressed = False
-                if event.key == pygame.K_UP:
-                    self.up_pressed = False
-                if event.key == pygame.K_DOWN:
-                    self.down_pressed = False
-                if event.key == pygame.K_SPACE:
-                    self.trigger_pressed = False
-
-        # Update player position based on the key press state
-        if self.is_lr_mapped_to_player:
-            if self.left_pressed:
-                self.playerx -= self.player_l_intensity
-            if self.right_pressed:
-                self.playerx += self.player_r_intensity
-        if self.is_ud_mapped_to_player:
-            if self.up_pressed:
-                self.playery -= self.player_u_intensity
-            if self.down_pressed:
-                self.playery += self.player_d_intensity
-
-        # Update enemy position based on the key press state
-        if self.is_lr_mapped_to_enemy:
-            if self.left_pressed:
-                self.enemyx -= self.enemy_l_intensity
-            if self.right_pressed:
-                self.enemyx += self.enemy_r_intensity
-        if self.is_ud_mapped_to_enemy:
-            if self.up_pressed:
-                self.enemyy -= self.enemy_u_intensity
-            if self.down_pressed:
-                self.enemyy += self.enemy_d_intensity
-
-        # Update object position based on the key press state
-        if self.is_lr_mapped_to_object:
-            if self.left_pressed:
-                self.objectx -= self.object_l_intensity
-            if self.right_pressed:
-                self.objectx += self.object_r_intensity
-        if self.is_ud_mapped_to_object:
-            if self.up_pressed:
-                self.objecty -= self.object_u_intensity
-            if self.down_pressed:
-                self.objecty += self.object_d_intensity
+        self.handle_events()
+        if profiler:
+            profiler.mark("events")
+
+        # moving, triggering and colliding
+        self.simulate()
+
+        # setting the fps
+        self.clock.tick(self.fps)
+        self.advance_frame_time()
+        if profiler:
+            profiler.mark("tick")
+            profiler.end_frame()
+
+    # pushing what was drawn to the display
+    def present(self):
+        if self.dirty_rendering:
+            self.update_dirty_rects()
+        else:
+            pygame.display.update()
+        # the frame that shows a movement from the keys has reached the display
+        if self.input_applied is not None:
+            self.input_latencies.append((time.perf_counter() - self.input_applied) * 1000)
+            self.input_applied = None
+
+    # checking for window events
+    # keys and joystick buttons are looked up in the binding tables, held actions are polled once per frame
+    def handle_events(self):
+        if self.replayer is not None:
+            pygame.event.get()
+            presses = self.replayer.next_frame(self)
+        else:
+            presses = []
+            for event in pygame.event.get():
+                # If close button is pressed
+                if event.type == pygame.QUIT:
+                    presses.append("quit")
+                elif event.type == pygame.KEYDOWN:
+                    action = self.key_bindings.get(event.key)
+                    if action is not None:
+                        presses.append(action)
+                elif event.type == pygame.JOYBUTTONDOWN:
+                    action = self.joystick_buttons.get(event.button)
+                    if action is not None:
+                        presses.append(action)
+                elif event.type == pygame.JOYHATMOTION and event.value != (0, 0) and self.input_time is None:
+                    self.input_time = time.perf_counter()
+                elif event.type == pygame.JOYDEVICEADDED and self.joystick is None:
+                    self.enable_joystick(event.device_index)
+            self.poll_input()
+            if self.recorder is not None:
+                self.recorder.frame(self.frame_now, self.actions, presses)
+        for action in presses:
+            self.press_action(action)
+
+    # an action whose key or button was just pressed
+    def press_action(self,action):
+        if action == "quit":
+            self.quit()
+        if action == "trigger":
+            self.trigger_pressed = True
+        elif action == "pause":
+            self.pause()
+        elif action == "restart":
+            pass        # only on the game over screen
+        elif self.input_time is None:
+            self.input_time = time.perf_counter()
+        for callback in self.action_callbacks.get(action, ()):
+            callback()
+
+    # reading the held keys (and the joystick) once per frame
+    def poll_input(self):
+        actions = self.actions
+        for action in actions:
+            actions[action] = False
+        pressed = pygame.key.get_pressed()
+        for key, action in self.held_keys:
+            if pressed[key]:
+                actions[action] = True
+        joystick = self.joystick
+        if joystick is not None:
+            deadzone = self.joystick_deadzone
+            xaxis = joystick.get_axis(0) if joystick.get_numaxes() > 0 else 0
+            yaxis = joystick.get_axis(1) if joystick.get_numaxes() > 1 else 0
+            xhat, yhat = joystick.get_hat(0) if joystick.get_numhats() > 0 else (0, 0)
+            if xaxis < -deadzone or xhat < 0:
+                actions["left"] = True
+            if xaxis > deadzone or xhat > 0:
+                actions["right"] = True
+            if yaxis < -deadzone or yhat > 0:
+                actions["up"] = True
+            if yaxis > deadzone or yhat < 0:
+                actions["down"] = True
+            for button, action in self.joystick_buttons.items():
+                if action not in self.PRESS_ACTIONS and button < joystick.get_numbuttons() and joystick.get_button(button):
+                    actions[action] = True
+
+    # the (key, action) pairs that are polled, made again when a binding changes
+    def update_key_table(self):
+        self.held_keys = [(key, action) for key, action in self.key_bindings.items() if action not in self.PRESS_ACTIONS]
+        for action in self.key_bindings.values():
+            self.actions.setdefault(action, False)
+
+    # binding a key to an action, the key is a pygame key (pygame.K_a) or its name ("a", "left", "space")
+    # actions: "left", "right", "up", "down", "trigger", "pause", "quit" or your own
+    def bind_key(self,key,action):
+        if isinstance(key, str):
+            try:
+                key = pygame.key.key_code(key)
+            except ValueError:
+                print("unknown key: " + key)
+                return
+        self.key_bindings[key] = action
+        self.update_key_table()
+
+    def unbind_key(self,key):
+        if isinstance(key, str):
+            try:
+                key = pygame.key.key_code(key)
+            except ValueError:
+                print("unknown key: " + key)
+                return
+        self.key_bindings.pop(key, None)
+        self.update_key_table()
+
+    # moving with W, A, S and D as well as the arrow keys
+    def use_wasd(self):
+        for key, action in (("w", "up"), ("a", "left"), ("s", "down"), ("d", "right")):
+            self.bind_key(key, action)
+
+    # binding a joystick button to an action
+    def bind_button(self,button,action):
+        self.joystick_buttons[button] = action
+        self.actions.setdefault(action, False)
+
+    # using a gamepad: the left stick and the d-pad move like the arrow keys, button 0 triggers
+    # deadzone: how far the stick has to be pushed
+    def enable_joystick(self,index=0,deadzone=0.3):
+        pygame.joystick.init()
+        if index >= pygame.joystick.get_count():
+            print("joystick not found")
+            return None
+        self.joystick = pygame.joystick.Joystick(index)
+        self.joystick_deadzone = deadzone
+        return self.joystick
+
+    # moving an entity (name, id or tag) while an action is held
+    # direction: (x, y) pixels per frame, or per second with run()
+    def map_action(self,action,type="player",direction=(0,0)):
+        self.action_moves = [move for move in self.action_moves if move[:2] != (action, type)]
+        if direction != (0, 0):
+            self.action_moves.append((action, type, direction[0], direction[1]))
+        self.actions.setdefault(action, False)
+
+    # calling a function every time an action's key or button is pressed
+    def on_action(self,action,callback):
+        self.action_callbacks.setdefault(action, []).append(callback)
+        self.actions.setdefault(action, False)
+
+    # whether an action is held right now
+    def action_pressed(self,action):
+        return self.actions.get(action, False)
+
+    # milliseconds from reading a movement key to showing the frame where the entity moved
+    # pygame gives no time stamps with its events, the time starts when the event is read
+    def input_latency_stats(self):
+        samples = sorted(self.input_latencies)
+        if not samples:
+            return {}
+        return {"count": len(samples), "mean": sum(samples) / len(samples), "p50": samples[len(samples) // 2],
+                "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))], "max": samples[-1]}
+
+    # one step of the game: key movement, triggers, collisions and lives
+    def simulate(self):
+        profiler = self.profiler
+        # timers and scripts that are due, and the assets the loader has finished
+        self.scheduler.update(self.now())
+        if self.asset_loader is not None:
+            self.update_assets()
+        if profiler:
+            profiler.mark("timers")
+
+        # animations, moved on by the time since the last step
+        if self.animations:
+            self.update_animations()
+            if profiler:
+                profiler.mark("animations")
+
+        # moving the entities mapped to the held actions
+        if self.action_moves:
+            actions = self.actions
+            x, y = self.entities.x, self.entities.y
+            moved = False
+            for action, type, dx, dy in self.action_moves:
+                if actions[action]:
+                    ids = self.entity_ids(type)
+                    x[ids] += dx * self.time_scale
+                    y[ids] += dy * self.time_scale
+                    moved = True
+            if moved and self.input_time is not None:
+                self.input_applied = self.input_time
+                self.input_time = None
+
+        if profiler:
+            profiler.mark("input")
+
+        # moving the entities that have a velocity
+        if self.entities.moving:
+            self.entities.integrate(self.time_scale)
+        if profiler:
+            profiler.mark("entities")
+
+        # bodies moved by the physics world
+        if self.physics is not None:
+            now = self.now()
+            self.physics.update(self.elapsed_since(self.physics_clock, now))
+            self.physics_clock = now
+            if profiler:
+                profiler.mark("physics")
+
+        # collisions between characters
+        for world in self.collision_worlds:
+            world.update()
+        for space in self.free_spaces.values():
+            space.update()
+        if profiler:
+            profiler.mark("collisions")
 
         # incase there is a trigger press
         if self.trigger_pressed:
-            self.triggered_state = True
             self.trigger_pressed = False
+            if self.projectiles is not None:
+                self.fire_projectile()
+            else:
+                self.triggered_state = True
+            # checking for sound in trigger and activating it
+            if self.trigger_sound_activated:
+                self.sound_bank.play("trigger")
 
         if self.triggered_state:
             self.trigger()
+        if self.projectiles is not None:
+            self.projectiles.advance(self.time_scale, self.wwidth, self.wheight)
+        for particles in self.particle_systems:
+            particles.update(self.time_scale)
+        if profiler:
+            profiler.mark("trigger")
 
         # collisions
         if self.collision_state:
@@ -196,12 +562,79 @@ class sajilopygame:
             if self.collision_effect == "random":
                 self.move_to_random(type=self.collision_type)
 
+        if profiler:
+            profiler.mark("effects")
+
         # checking for game over
         if self.lives == 0:
             self.game_over()
-
-        # setting the fps
-        self.clock.tick(self.fps)
+        if profiler:
+            profiler.mark("lives")
+
+    # running the game with a fixed simulation step
+    # update() is called step times a second to move things, draw() once per rendered frame
+    # in this mode speeds and intensities are in pixels per second
+    # interpolate draws the entities between their last two steps for smoother motion
+    def run(self,update=None,draw=None,step=1/120,max_steps=10,interpolate=False):
+        self.step_time = step
+        self.running = True
+        accumulator = 0
+        previous = self.now()
+        while self.running:
+            now = self.now()
+            accumulator += now - previous
+            previous = now
+
+            if self.scene != "playing":
+                self.idle_scene()
+                previous = self.now()
+                continue
+
+            profiler = self.profiler
+            self.handle_events()
+            if profiler:
+                profiler.mark("events")
+
+            self.time_scale = step
+            steps = 0
+            while accumulator >= step and steps < max_steps:
+                if interpolate:
+                    self.entities.save_previous()
+                if update is not None:
+                    update()
+                if profiler:
+                    profiler.mark("user")
+                self.simulate()
+                accumulator -= step
+                steps += 1
+            self.time_scale = 1
+            if steps == max_steps:
+                accumulator = 0     # too far behind, dropping time instead of slowing the game down
+
+            if interpolate:
+                self.entities.interpolate(accumulator / step)
+            if draw is not None:
+                draw()
+            if interpolate:
+                self.entities.restore()
+            if profiler:
+                profiler.mark("user")
+                if profiler.overlay:
+                    self.draw_profiler_overlay()
+                    profiler.mark("overlay")
+            self.present()
+            if profiler:
+                profiler.mark("present")
+
+            self.clock.tick(self.fps)
+            self.advance_frame_time()
+            if profiler:
+                profiler.mark("tick")
+                profiler.end_frame()
+
+    # stopping the loop started with run()
+    def stop(self):
+        self.running = False
 
 
     # loading the window title
@@ -215,307 +648,291 @@ class sajilopygame:
 
     # loading background color
     def background_color(self,color):
-        self.screen.fill(color)
+        self.set_background(("color", tuple(color)))
 
     # loading the background
-    def background_image(self,image_path):
-        self.background = pygame.image.load(image_path)
-        self.bg_width, self.bg_height = self.background.get_size()
-        self.screen.blit(self.background,(0,0))
+    # scale_to_window stretches the image to the size of the window
+    def background_image(self,image_path,scale_to_window=False):
+        self.set_background(("image", image_path, scale_to_window))
+
+    # changing what the background is made of, then drawing it
+    def set_background(self,source):
+        if source != self.background_source:
+            self.background_source = source
+            self.background_layer = None    # rebuilt when drawn
+        self.draw_background()
+
+    # drawing the background layer, a single blit unless the layer changed
+    def draw_background(self):
+        if self.background_layer is None:
+            self.background_layer = self.build_background_layer()
+            if self.dirty_rendering:
+                self.full_redraw = True
+        elif self.dirty_rendering:
+            return      # the last frame was already erased with the layer
+        self.screen.blit(self.background_layer, (0, 0))
+
+    # compositing the background color or image and the static items into one surface
+    def build_background_layer(self):
+        layer = pygame.Surface(self.screen.get_size()).convert()
+        if self.background_source is None or self.background_source[0] == "color":
+            layer.fill(self.background_source[1] if self.background_source else (0, 0, 0))
+        else:
+            image_path, scale_to_window = self.background_source[1:]
+            self.background = self.load_background(image_path, scale_to_window)
+            self.bg_width, self.bg_height = self.background.get_size()
+            layer.blit(self.background, (0, 0))
+        for draw in self.background_items.values():
+            draw(layer)
+        return layer
+
+    # loading and converting a background image once
+    def load_background(self,image_path,scale_to_window=False):
+        key = (image_path, scale_to_window)
+        image = self.background_images.get(key)
+        if image is None:
+            image = self.image_cache.get(self.asset_key(image_path))     # preloaded or from an atlas
+            if image is None:
+                image = pygame.image.load(image_path)
+                image = image.convert_alpha() if image.get_alpha() is not None else image.convert()
+            if scale_to_window:
+                image = pygame.transform.smoothscale(image, self.screen.get_size())
+            self.background_images[key] = image
+        return image
+
+    # adding something static to the background layer
+    # calling it again with the same values every frame does not rebuild the layer
+    def add_background_item(self,key,draw):
+        if key not in self.background_items:
+            self.background_items[key] = draw
+            self.background_layer = None
+
+    # removing the static texts and shapes from the background
+    def clear_background_items(self):
+        if self.background_items:
+            self.background_items = {}
+            self.background_layer = None
+
+    # text that stays on the background
+    def background_text(self,text="your text here",font="comicsansms",font_size=20,color=(255,255,255),xpos=0,ypos=0):
+        key = ("text", text, font, font_size, tuple(color), xpos, ypos)
+        self.add_background_item(key, lambda layer: layer.blit(self.render_text(text, font, font_size, color), (xpos, ypos)))
+
+    # a rectangle that stays on the background
+    def background_rect(self,color=(255,255,255),org=(50,50),width=100,height=100,border_thickness=0,border_radius=0):
+        key = ("rect", tuple(color), tuple(org), width, height, border_thickness, border_radius)
+        rect = (org[0], org[1], width, height)
+        self.add_background_item(key, lambda layer: pygame.draw.rect(layer, color, rect, border_thickness, border_radius))
+
+    # a line that stays on the background
+    def background_line(self,start=(0,0),end=(0,0),color=(255,255,255),width=1):
+        key = ("line", tuple(start), tuple(end), tuple(color), width)
+        self.add_background_item(key, lambda layer: pygame.draw.line(layer, color, start, end, width))
+
+    # a polygon that stays on the background
+    def background_polygon(self,color=(255,255,255),points=None,border_thickness=0):
+        if points is None:
+            print("points not specified")
+            return
+        key = ("polygon", tuple(color), tuple(map(tuple, points)), border_thickness)
+        self.add_background_item(key, lambda layer: pygame.draw.polygon(layer, color, points, border_thickness))
+
+    # turning on dirty rectangle rendering
+    # only the parts of the window that changed are pushed to the display,
+    # the whole window is pushed when more than threshold of it changed
+    def enable_dirty_rects(self,threshold=0.5):
+        self.dirty_rendering = True
+        self.dirty_threshold = threshold
+        self.dirty_rects = []
+        self.erased_rects = []
+        self.full_redraw = True
+
+    # turning off dirty rectangle rendering
+    def disable_dirty_rects(self):
+        self.dirty_rendering = False
+        self.dirty_rects = []
+        self.erased_rects = []
+
+    # drawing an image on the window, remembering where it was drawn
+    def blit(self,image,position):
+        rect = self.screen.blit(image, position)
+        if self.dirty_rendering:
+            self.dirty_rects.append(rect)
+        return rect
+
+    # remembering a part of the window that was drawn on
+    def mark_dirty(self,rect):
+        if self.dirty_rendering:
+            self.dirty_rects.append(rect)
+        return rect
+
+    # pushing the changed parts of the window to the display
+    def update_dirty_rects(self):
+        screen_rect = self.screen.get_rect()
+        rects = [rect.clip(screen_rect) for rect in self.dirty_rects + self.erased_rects]
+        dirty_area = sum(rect.width * rect.height for rect in rects)
+        if self.full_redraw or dirty_area > self.dirty_threshold * screen_rect.width * screen_rect.height:
+            pygame.display.update()
+        elif rects:
+            pygame.display.update(rects)
+        # erasing this frame's drawings so that the next frame starts from the background
+        if self.background_layer is not None:
+            self.screen.blits([(self.background_layer, rect, rect) for rect in self.dirty_rects], False)
+        self.erased_rects = self.dirty_rects
+        self.dirty_rects = []
+        self.full_redraw = False
 
     # creating a player
     def create_player(self,image_path,org=(370,480)):
         self.player_image_path = image_path
         self.playerx, self.playery = org
-        self.player_img = pygame.image.load(image_path).convert_alpha()
+        self.start_positions["player"] = org
+        self.player_img = self.load_image(image_path)
         self.player_width, self.player_height = self.player_img.get_size()
         self.player_rect = self.player_img.get_rect()
+        self.player_variants = self.load_sprite_variants(image_path)
 
     # loading a player
     def load_player(self):
         if self.player_transformed:
             return      # transformation set in
         elif self.is_lr_mapped_to_player:
-            # checking if there are other images for each keystroke
-            pathname = os.path.dirname(self.player_image_path)
-            image_name = self.player_image_path.split("/")[-1]
-            image_name_wo_ext = image_name.split(".")[0]   # without extension
-            image_ext = image_name.split(".")[-1]
-            left_image_placeholder = pathname+'/'+image_name_wo_ext+"_left"+"."+image_ext
-            up_left_image_placeholder = pathname+'/'+image_name_wo_ext+"_up_left"+"."+image_ext
-            down_left_image_placeholder = pathname+'/'+image_name_wo_ext+"_down_left"+"."+image_ext
-            right_image_placeholder = pathname+'/'+image_name_wo_ext+"_right"+"."+image_ext
-            up_right_image_placeholder = pathname+'/'+image_name_wo_ext+"_up_right"+"."+image_ext
-            down_right_image_placeholder = pathname+'/'+image_name_wo_ext+"_down_right"+"."+image_ext
-            up_image_placeholder = pathname+'/'+image_name_wo_ext+"_up"+"."+image_ext
-            down_image_placeholder = pathname+'/'+image_name_wo_ext+"_down"+"."+image_ext
-            # checking for keystrokes
-            if self.left_pressed and self.up_pressed:
-                if os.path.exists(up_left_image_placeholder):
-                    up_left_image = pygame.image.load(up_left_image_placeholder)
-                    self.screen.blit(up_left_image,(self.playerx,self.playery))
-            elif self.left_pressed and self.down_pressed:
-                if os.path.exists(down_left_image_placeholder):
-                    down_left_image = pygame.image.load(down_left_image_placeholder)
-                    self.screen.blit(down_left_image,(self.playerx,self.playery))
-            elif self.left_pressed and not self.up_pressed and not self.down_pressed:
-                if os.path.exists(left_image_placeholder):
-                    left_image = pygame.image.load(left_image_placeholder)
-                    self.screen.blit(left_image,(self.playerx,self.playery))
-                else:
-                    self.screen.blit(self.player_img, (self.playerx, self.playery))
-            elif self.right_pressed and self.up_pressed:
-                if os.path.exists(up_right_image_placeholder):
-                    up_right_image = pygame.image.load(up_right_image_placeholder)
-                    self.screen.blit(up_right_image,(self.playerx,self.playery))
-            elif self.right_pressed and self.down_pressed:
-                if os.path.exists(down_right_image_placeholder):
-                    down_right_image = pygame.image.load(down_right_image_placeholder)
-                    self.screen.blit(down_right_image,(self.playerx,self.playery))
-            elif self.right_pressed and not self.up_pressed and not self.down_pressed:
-                if os.path.exists(right_image_placeholder):
-                    right_image = pygame.image.load(right_image_placeholder)
-                    self.screen.blit(right_image,(self.playerx,self.playery))
-                else:
-                    self.screen.blit(self.player_img, (self.playerx, self.playery))
-            elif self.up_pressed and not self.left_pressed and not self.right_pressed:
-                if os.path.exists(up_image_placeholder):
-                    up_image = pygame.image.load(up_image_placeholder)
-                    self.screen.blit(up_image,(self.playerx,self.playery))
-                else:
-                    self.screen.blit(self.player_img, (self.playerx, self.playery))
-            elif self.down_pressed and not self.left_pressed and not self.right_pressed:
-                if os.path.exists(down_image_placeholder):
-                    down_image = pygame.image.load(down_image_placeholder)
-                    self.screen.blit(down_image,(self.playerx,self.playery))
-                else:
-                    self.screen.blit(self.player_img, (self.playerx, self.playery))
-            else:
-                self.screen.blit(self.player_img, (self.playerx, self.playery))
+            image = self.player_variants.get(self.pressed_direction(), self.player_img)
+            self.drawn_images["player"] = image
+            self.blit(image, self.to_screen((self.playerx, self.playery)))
         else:
-            self.screen.blit(self.player_img, (self.playerx, self.playery))
+            self.drawn_images["player"] = self.player_img
+            self.blit(self.player_img, self.to_screen((self.playerx, self.playery)))
 
     # creating an enemy
     def create_enemy(self,image_path,org=(370,40)):
         self.enemy_image_path = image_path
         self.enemyx, self.enemyy = org
-        self.enemy_img = pygame.image.load(image_path)
+        self.start_positions["enemy"] = org
+        self.enemy_img = self.load_image(image_path)
         self.enemy_width, self.enemy_height = self.enemy_img.get_size()
+        self.enemy_variants = self.load_sprite_variants(image_path)
 
     # loading an enemy
     def load_enemy(self):
-        if self.is_lr_mapped_to_enemy:
-            # checking if there are other images for each keystroke
-            pathname = os.path.dirname(self.enemy_image_path)
-            image_name = self.enemy_image_path.split("/")[-1]
-            image_name_wo_ext = image_name.split(".")[0]  # without extension
-            image_ext = image_name.split(".")[-1]
-            left_image_placeholder = pathname + '/' + image_name_wo_ext + "_left" + "." + image_ext
-            up_left_image_placeholder = pathname + '/' + image_name_wo_ext + "_up_left" + "." + image_ext
-            down_left_image_placeholder = pathname + '/' + image_name_wo_ext + "_down_left" + "." + image_ext
-            right_image_placeholder = pathname + '/' + image_name_wo_ext + "_right" + "." + image_ext
-            up_right_image_placeholder = pathname + '/' + image_name_wo_ext + "_up_right" + "." + image_ext
-            down_right_image_placeholder = pathname + '/' + image_name_wo_ext + "_down_right" + "." + image_ext
-            up_image_placeholder = pathname + '/' + image_name_wo_ext + "_up" + "." + image_ext
-            down_image_placeholder = pathname + '/' + image_name_wo_ext + "_down" + "." + image_ext
-            # checking for keystrokes
-            if self.left_pressed and self.up_pressed:
-                if os.path.exists(up_left_image_placeholder):
-                    up_left_image = pygame.image.load(up_left_image_placeholder)
-                    self.screen.blit(up_left_image, (self.enemyx, self.enemyy))
-            elif self.left_pressed and self.down_pressed:
-                if os.path.exists(down_left_image_placeholder):
-                    down_left_image = pygame.image.load(down_left_image_placeholder)
-                    self.screen.blit(down_left_image, (self.enemyx, self.enemyy))
-            elif self.left_pressed and not self.up_pressed and not self.down_pressed:
-                if os.path.exists(left_image_placeholder):
-                    left_image = pygame.image.load(left_image_placeholder)
-                    self.screen.blit(left_image, (self.enemyx, self.enemyy))
-                else:
-                    self.screen.blit(self.enemy_img, (self.enemyx, self.enemyy))
-            elif self.right_pressed and self.up_pressed:
-                if os.path.exists(up_right_image_placeholder):
-                    up_right_image = pygame.image.load(up_right_image_placeholder)
-                    self.screen.blit(up_right_image, (self.enemyx, self.enemyy))
-            elif self.right_pressed and self.down_pressed:
-                if os.path.exists(down_right_image_placeholder):
-                    down_right_image = pygame.image.load(down_right_image_placeholder)
-                    self.screen.blit(down_right_image, (self.enemyx, self.enemyy))
-            elif self.right_pressed and not self.up_pressed and not self.down_pressed:
-                if os.path.exists(right_image_placeholder):
-                    right_image = pygame.image.load(right_image_placeholder)
-                    self.screen.blit(right_image, (self.enemyx, self.enemyy))
-                else:
-                    self.screen.blit(self.enemy_img, (self.enemyx, self.enemyy))
-            elif self.up_pressed and not self.left_pressed and not self.right_pressed:
-                if os.path.exists(up_image_placeholder):
-                    up_image = pygame.image.load(up_image_placeholder)
-                    self.screen.blit(up_image, (self.enemyx, self.enemyy))
-                else:
-                    self.screen.blit(self.enemy_img, (self.enemyx, self.enemyy))
-            elif self.down_pressed and not self.left_pressed and not self.right_pressed:
-                if os.path.exists(down_image_placeholder):
-                    down_image = pygame.image.load(down_image_placeholder)
-                    self.screen.blit(down_image, (self.enemyx, self.enemyy))
-                else:
-                    self.screen.blit(self.enemy_img, (self.enemyx, self.enemyy))
-            else:
-                self.screen.blit(self.enemy_img, (self.enemyx, self.enemyy))
+        if self.enemy_transformed:
+            return      # transformation set in
+        elif self.is_lr_mapped_to_enemy:
+            image = self.enemy_variants.get(self.pressed_direction(), self.enemy_img)
+            self.drawn_images["enemy"] = image
+            self.blit(image, self.to_screen((self.enemyx, self.enemyy)))
         else:
-            self.screen.blit(self.enemy_img, (self.enemyx, self.enemyy))
+            self.drawn_images["enemy"] = self.enemy_img
+            self.blit(self.enemy_img, self.to_screen((self.enemyx, self.enemyy)))
 
     # creating an object
     def create_object(self,image_path,org=(370,240)):
         self.object_image_path = image_path
         self.objectx, self.objecty = org
-        self.object_img = pygame.image.load(image_path)
+        self.start_positions["object"] = org
+        self.object_img = self.load_image(image_path)
         self.object_width, self.object_height = self.object_img.get_size()
+        self.object_variants = self.load_sprite_variants(image_path)
 
     # loading an object
     def load_object(self):
-        if self.is_lr_mapped_to_object:
-            # checking if there are other images for each keystroke
-            pathname = os.path.dirname(self.object_image_path)
-            image_name = self.object_image_path.split("/")[-1]
-            image_name_wo_ext = image_name.split(".")[0]  # without extension
-            image_ext = image_name.split(".")[-1]
-            left_image_placeholder = pathname + '/' + image_name_wo_ext + "_left" + "." + image_ext
-            up_left_image_placeholder = pathname + '/' + image_name_wo_ext + "_up_left" + "." + image_ext
-            down_left_image_placeholder = pathname + '/' + image_name_wo_ext + "_down_left" + "." + image_ext
-            right_image_placeholder = pathname + '/' + image_name_wo_ext + "_right" + "." + image_ext
-            up_right_image_placeholder = pathname + '/' + image_name_wo_ext + "_up_right" + "." + image_ext
-            down_right_image_placeholder = pathname + '/' + image_name_wo_ext + "_down_right" + "." + image_ext
-            up_image_placeholder = pathname + '/' + image_name_wo_ext + "_up" + "." + image_ext
-            down_image_placeholder = pathname + '/' + image_name_wo_ext + "_down" + "." + image_ext
-            # checking for keystrokes
-            if self.left_pressed and self.up_pressed:
-                if os.path.exists(up_left_image_placeholder):
-                    up_left_image = pygame.image.load(up_left_image_placeholder)
-                    self.screen.blit(up_left_image, (self.objectx, self.objecty))
-            elif self.left_pressed and self.down_pressed:
-                if os.path.exists(down_left_image_placeholder):
-                    down_left_image = pygame.image.load(down_left_image_placeholder)
-                    self.screen.blit(down_left_image, (self.objectx, self.objecty))
-            elif self.left_pressed and not self.up_pressed and not self.down_pressed:
-                if os.path.exists(left_image_placeholder):
-                    left_image = pygame.image.load(left_image_placeholder)
-                    self.screen.blit(left_image, (self.objectx, self.objecty))
-                else:
-                    self.screen.blit(self.object_img, (self.objectx, self.objecty))
-            elif self.right_pressed and self.up_pressed:
-                if os.path.exists(up_right_image_placeholder):
-                    up_right_image = pygame.image.load(up_right_image_placeholder)
-                    self.screen.blit(up_right_image, (self.objectx, self.objecty))
-            elif self.right_pressed and self.down_pressed:
-                if os.path.exists(down_right_image_placeholder):
-                    down_right_image = pygame.image.load(down_right_image_placeholder)
-                    self.screen.blit(down_right_image, (self.objectx, self.objecty))
-            elif self.right_pressed and not self.up_pressed and not self.down_pressed:
-                if os.path.exists(right_image_placeholder):
-                    right_image = pygame.image.load(right_image_placeholder)
-                    self.screen.blit(right_image, (self.objectx, self.objecty))
-                else:
-                    self.screen.blit(self.object_img, (self.objectx, self.objecty))
-            elif self.up_pressed and not self.left_pressed and not self.right_pressed:
-                if os.path.exists(up_image_placeholder):
-                    up_image = pygame.image.load(up_image_placeholder)
-                    self.screen.blit(up_image, (self.objectx, self.objecty))
-                else:
-                    self.screen.blit(self.object_img, (self.objectx, self.objecty))
-            elif self.down_pressed and not self.left_pressed and not self.right_pressed:
-                if os.path.exists(down_image_placeholder):
-                    down_image = pygame.image.load(down_image_placeholder)
-                    self.screen.blit(down_image, (self.objectx, self.objecty))
-                else:
-                    self.screen.blit(self.object_img, (self.objectx, self.objecty))
-            else:
-                self.screen.blit(self.object_img, (self.objectx, self.objecty))
+        if self.object_transformed:
+            return      # transformation set in
+        elif self.is_lr_mapped_to_object:
+            image = self.object_variants.get(self.pressed_direction(), self.object_img)
+            self.drawn_images["object"] = image
+            self.blit(image, self.to_screen((self.objectx, self.objecty)))
         else:
-            self.screen.blit(self.object_img, (self.objectx, self.objecty))
+            self.drawn_images["object"] = self.object_img
+            self.blit(self.object_img, self.to_screen((self.objectx, self.objecty)))
+
+    # finding and decoding the directional images of a sprite once
+    # e.g. for "bat.png" it looks for "bat_left.png", "bat_up_left.png" and so on
+    def load_sprite_variants(self,image_path):
+        variants = {}
+        image_name_wo_ext, image_ext = os.path.splitext(image_path)
+        for direction in self.SPRITE_DIRECTIONS:
+            variant_path = image_name_wo_ext + "_" + direction + image_ext
+            if os.path.exists(variant_path):
+                variants[direction] = self.load_image(variant_path)
+        return variants
+
+    # the direction the arrow keys are pointing to, e.g. "up_left"
+    # returns None when no arrow key is pressed
+    def pressed_direction(self):
+        if self.left_pressed:
+            horizontal = "left"
+        elif self.right_pressed:
+            horizontal = "right"
+        else:
+            horizontal = None
+        if self.up_pressed:
+            vertical = "up"
+        elif self.down_pressed:
+            vertical = "down"
+        else:
+            vertical = None
+        if vertical and horizontal:
+            return vertical + "_" + horizontal
+        return vertical or horizontal
 
     # assign Left, Right keystrokes
     def assign_lr_keys(self,type="player",intensity=(1,1)):
-        if type == "player":
-            self.is_lr_mapped_to_player = True
-            self.player_l_intensity, self.player_r_intensity = intensity
-        if type == "enemy":
-            self.is_lr_mapped_to_enemy = True
-            self.enemy_l_intensity, self.enemy_r_intensity = intensity
-        if type == "object":
-            self.is_lr_mapped_to_object = True
-            self.object_l_intensity, self.object_r_intensity = intensity
+        if type in self.named_entities:
+            setattr(self, "is_lr_mapped_to_" + type, True)
+            setattr(self, type + "_l_intensity", intensity[0])
+            setattr(self, type + "_r_intensity", intensity[1])
+        self.map_action("left", type, (-intensity[0], 0))
+        self.map_action("right", type, (intensity[1], 0))
 
     # assign Up, Down keystrokes
     def assign_ud_keys(self,type="player",intensity=(1,1)):
-        if type == "player":
-            self.is_ud_mapped_to_player = True
-            self.player_u_intensity, self.player_d_intensity = intensity
-        if type == "enemy":
-            self.is_ud_mapped_to_enemy = True
-            self.enemy_u_intensity, self.enemy_d_intensity = intensity
-        if type == "object":
-            self.is_ud_mapped_to_object = True
-            self.object_u_intensity, self.object_d_intensity = intensity
+        if type in self.named_entities:
+            setattr(self, "is_ud_mapped_to_" + type, True)
+            setattr(self, type + "_u_intensity", intensity[0])
+            setattr(self, type + "_d_intensity", intensity[1])
+        self.map_action("up", type, (0, -intensity[0]))
+        self.map_action("down", type, (0, intensity[1]))
+
+    # finding the entities a type refers to
+    # "player", "enemy" and "object" (or an entity id) give a single entity,
+    # any other tag gives an array with every entity created with that tag
+    def entity_ids(self,type="player"):
+        if type in self.named_entities:
+            return self.named_entities[type]
+        if isinstance(type, (int, np.integer)):
+            return int(type)
+        return self.entities.ids(type)
 
     # getting the positions
     def find_position(self,type="player"):
-        if type == "player":
-            return self.playerx, self.playery
-        if type == "enemy":
-            return self.enemyx, self.enemyy
-        if type == "object":
-            return self.objectx, self.objecty
+        ids = self.entity_ids(type)
+        if isinstance(ids, int):
+            return self.entities.value(ids, "x"), self.entities.value(ids, "y")
+        return self.entities.x[ids], self.entities.y[ids]
 
     # update position
     def update_position(self,type="player",xpos=0,ypos=0):
-        if type == "player":
-            self.playerx = xpos
-            self.playery = ypos
-        if type == "enemy":
-            self.enemyx = xpos
-            self.enemyy = ypos
-        if type == "object":
-            self.objectx = xpos
-            self.objecty = ypos
+        ids = self.entity_ids(type)
+        self.entities.x[ids] = xpos
+        self.entities.y[ids] = ypos
+
+    # getting the rectangle an entity covers
+    def entity_rect(self,type="player"):
+        xpos, ypos = self.find_position(type=type)
+        width, height = self.find_size(type=type)
+        return pygame.Rect(xpos, ypos, width, height)
 
     # getting the size
     def find_size(self,type="player"):
-        if type == "player":
-            return self.player_width, self.player_height
-        if type == "enemy":
-            return self.enemy_width, self.enemy_height
-        if type == "object":
-            return self.object_width, self.object_height
+        ids = self.entity_ids(type)
+        if isinstance(ids, int):
+            return self.entities.value(ids, "width"), self.entities.value(ids, "height")
+        return self.entities.width[ids], self.entities.height[ids]
 
     # bounding to the window
     def bound_to_window(self,type="player"):
-        if type == "player":
-            if self.playerx < 0:
-                self.playerx = 0
-            elif self.playerx > self.wwidth - self.player_width:
-                self.playerx = self.wwidth - self.player_width
-            if self.playery < 0:
-                self.playery = 0
-            elif self.playery > self.wheight - self.player_height:
-                self.playery = self.wheight - self.player_height
-        if type == "enemy":
-            if self.enemyx < 0:
-                self.enemyx = 0
-            elif self.enemyx > self.wwidth - self.enemy_width:
-                self.enemyx = self.wwidth - self.enemy_width
-            if self.enemyy < 0:
-                self.enemyy = 0
-            elif self.enemyy > self.wheight - self.enemy_height:
-                self.enemyy = self.wheight - self.enemy_height
-        if type == "object":
-            if self.objectx < 0:
-                self.objectx = 0
-            elif self.objectx > self.wwidth - self.object_width:
-                self.objectx = self.wwidth - self.object_width
-            if self.objecty < 0:
-                self.objecty = 0
-            elif self.objecty > self.wheight - self.object_height:
-                self.objecty = self.wheight - self.object_height
+        self.entities.bound(self.entity_ids(type), self.wwidth, self.wheight)
 
     # bounding a character to the window
     def bound_character_to_window(self,obj):
@@ -530,109 +947,99 @@ class sajilopygame:
 
     # move from left to right
     def move_left_to_right(self,type="enemy",speed=1):
-        if type == "enemy":
-            self.enemyx = self.enemyx + speed
-        if type == "object":
-            self.objectx = self.objectx + speed
-        if type == "player":
-            self.playerx = self.playerx + speed
+        self.entities.x[self.entity_ids(type)] += speed * self.time_scale
 
     # move from right to left
     def move_right_to_left(self,type="enemy",speed=1):
-        if type == "enemy":
-            self.enemyx = self.enemyx - speed
-        if type == "object":
-            self.objectx = self.objectx - speed
-        if type == "player":
-            self.playerx = self.playerx - speed
+        self.entities.x[self.entity_ids(type)] -= speed * self.time_scale
 
     # move from up to down
     def move_top_to_bottom(self,type="enemy",speed=1):
-        if type == "enemy":
-            self.enemyy = self.enemyy + speed
-        if type == "object":
-            self.objecty = self.objecty + speed
-        if type == "player":
-            self.playery = self.playery + speed
+        self.entities.y[self.entity_ids(type)] += speed * self.time_scale
 
     # move from down to up
     def move_bottom_to_top(self,type="enemy",speed=1):
-        if type == "enemy":
-            self.enemyy = self.enemyy - speed
-        if type == "object":
-            self.objecty = self.objecty - speed
-        if type == "player":
-            self.playery = self.playery - speed
+        self.entities.y[self.entity_ids(type)] -= speed * self.time_scale
 
     # edge detection
+    # returns the last edge touched ("left", "right", "top", "bottom" or None),
+    # or an array of them when the type is a tag
     def detect_edge(self,type="enemy"):
-        if type == "player":
-            if self.playerx == 0:
-                self.last_detected_edge_player = "left"
-            if self.playerx == self.wwidth-self.player_width:
-                self.last_detected_edge_player = "right"
-            if self.playery == 0:
-                self.last_detected_edge_player = "top"
-            if self.playery == self.wheight-self.player_height:
-                self.last_detected_edge_player = "bottom"
-        if type == "enemy":
-            if self.enemyx == 0:
-                self.last_detected_edge_enemy = "left"
-            if self.enemyx == self.wwidth-self.enemy_width:
-                self.last_detected_edge_enemy = "right"
-            if self.enemyy == 0:
-                self.last_detected_edge_enemy = "top"
-            if self.enemyy == self.wheight-self.enemy_height:
-                self.last_detected_edge_enemy = "bottom"
-        if type == "object":
-            if self.objectx == 0:
-                self.last_detected_edge_object = "left"
-            if self.objectx == self.wwidth-self.object_width:
-                self.last_detected_edge_object = "right"
-            if self.objecty == 0:
-                self.last_detected_edge_object = "top"
-            if self.objecty == self.wheight-self.object_height:
-                self.last_detected_edge_object = "bottom"
-
-        if type == "player":
-            return self.last_detected_edge_player
-        elif type == "object":
-            return self.last_detected_edge_object
-        elif type == "enemy":
-            return self.last_detected_edge_enemy
+        ids = self.entity_ids(type)
+        edges = self.entities.detect_edge(ids, self.wwidth, self.wheight)
+        if isinstance(ids, int):
+            return self.entities.EDGE_NAMES[edges]
+        return self.entities.EDGE_NAME_ARRAY[edges]
 
     # bouncing left and right
     def bounce_left_right(self,type="enemy",speed=1):
-        edge = self.detect_edge(type=type)
-
-        if edge == "left":
-            self.move_left_to_right(type=type, speed=speed)
-        elif edge == "right":
-            self.move_right_to_left(type=type, speed=speed)
-        else:
-            self.move_left_to_right(type=type, speed=speed)
+        ids = self.entity_ids(type)
+        edges = self.entities.detect_edge(ids, self.wwidth, self.wheight)
+        # moving right unless the right edge was the last one touched
+        speed = speed * self.time_scale
+        self.entities.x[ids] += np.where(edges == self.entities.EDGE_RIGHT, -speed, speed)
 
     # bouncing up and down
     def bounce_up_down(self,type="enemy",speed=1):
-        edge = self.detect_edge(type=type)
-
-        if edge == "top":
-            self.move_top_to_bottom(type=type, speed=speed)
-        elif edge == "bottom":
-            self.move_bottom_to_top(type=type, speed=speed)
-        else:
-            self.move_top_to_bottom(type=type, speed=speed)
+        ids = self.entity_ids(type)
+        edges = self.entities.detect_edge(ids, self.wwidth, self.wheight)
+        # moving down unless the bottom edge was the last one touched
+        speed = speed * self.time_scale
+        self.entities.y[ids] += np.where(edges == self.entities.EDGE_BOTTOM, -speed, speed)
 
     # bouncing top and bottom
     def bounce_top_bottom(self,type="enemy",speed=1):
-        edge = self.detect_edge(type=type)
-
-        if edge == "top":
-            self.move_top_to_bottom(type=type, speed=speed)
-        elif edge == "bottom":
-            self.move_bottom_to_top(type=type, speed=speed)
+        self.bounce_up_down(type=type, speed=speed)
+
+    # creating an entity, many entities can share the same tag
+    # returns the id of the entity
+    def create_entity(self,image_path=None,org=(0,0),tag="entity",size=None):
+        image = None
+        if image_path is not None:
+            image = self.load_image(image_path)
+            if size is None:
+                size = image.get_size()
+        return self.entities.spawn(tag=tag, org=org, size=size or (0, 0), image=image)
+
+    # removing an entity
+    def remove_entity(self,id):
+        self.entities.kill(id)
+
+    # setting the velocity (pixels per frame, pixels per second with run()) of an entity or a tag
+    def set_velocity(self,type="enemy",xspeed=0,yspeed=0):
+        ids = self.entity_ids(type)
+        self.entities.vx[ids] = xspeed
+        self.entities.vy[ids] = yspeed
+        self.entities.moving = True
+
+    # loading the entities of a tag (or all of them) with a single batched blit
+    def load_entities(self,tag=None):
+        if self.dirty_rendering:
+            self.dirty_rects.extend(self.screen.blits(self.entities.blit_sequence(tag, self.camera_offset())))
         else:
-            self.move_top_to_bottom(type=type, speed=speed)
+            self.screen.blits(self.entities.blit_sequence(tag, self.camera_offset()), False)
+
+    # loading an image once, later calls with the same path reuse it
+    def load_image(self,image_path):
+        key = self.asset_key(image_path)
+        image = self.image_cache.get(key)
+        if image is None:
+            image = pygame.image.load(image_path).convert_alpha()
+            self.image_cache[key] = image
+        return image
+
+    # the key images and sounds are cached under
+    # a relative and an absolute path to the same file give the same key, so the atlas and the preloader are found either way
+    # the absolute paths are remembered, so looking one up again is a dict lookup
+    def asset_key(self,path):
+        if isinstance(path, str):
+            key = self.asset_keys.get(path)
+            if key is None:
+                key = self.asset_keys[path] = os.path.abspath(path)
+            return key
+        if isinstance(path, os.PathLike):
+            return os.path.abspath(path)
+        return path
 
     # releasing
     def assign_trigger(self,type="object",start_pos=(370,240),dir="b2t",speed=1):
@@ -723,11 +1130,76 @@ class sajilopygame:
                 if x >= self.wwidth + self.enemy_width:
                     self.triggered_state = False
                     self.end_trigger = False
-        # checking for sound in trigger and activating it
-        if self.trigger_sound_activated:
-            self.trigger_sound = pygame.mixer.Sound(self.trigger_sound_path)
-            self.trigger_sound.set_volume(self.trigger_sound_volume)
-            self.trigger_sound.play()
+
+    # many shots at the same time: every press of the trigger key (space) fires a projectile
+    # start: the entity the projectiles come out of, or an (x, y) position
+    # dir: "b2t", "t2b", "l2r" or "r2l" like assign_trigger
+    # capacity: the most projectiles in flight, they are made once and reused
+    def assign_projectiles(self,image_path,start="player",dir="b2t",speed=5,capacity=64):
+        image = self.load_image(image_path)
+        pool = self.projectiles
+        # called again (e.g. every frame) with the same image and capacity, the projectiles in flight are kept
+        if pool is None or pool.image is not image or pool.capacity != capacity:
+            self.projectiles = self.projectilepool(image, capacity=capacity)
+        self.projectile_start = start
+        self.projectile_dir = dir
+        self.projectile_speed = speed
+
+    # firing a projectile, returns False when all of them are in flight
+    def fire_projectile(self):
+        pool = self.projectiles
+        if isinstance(self.projectile_start, tuple):
+            x, y = self.projectile_start
+        else:
+            rect = self.entity_rect(self.projectile_start)
+            x, y = rect.centerx - pool.width / 2, rect.centery - pool.height / 2
+        vx, vy = self.TRIGGER_DIRECTIONS[self.projectile_dir]
+        return pool.spawn(x, y, vx * self.projectile_speed, vy * self.projectile_speed)
+
+    # drawing the projectiles in flight
+    def load_projectiles(self):
+        if self.projectiles is None:
+            return
+        if self.dirty_rendering:
+            self.dirty_rects.extend(self.screen.blits(self.projectiles.blit_sequence(self.camera_offset())))
+        else:
+            self.screen.blits(self.projectiles.blit_sequence(self.camera_offset()), False)
+
+    # projectiles hitting an entity, the projectiles that hit are recycled
+    def detect_projectile_collision(self,collision_with="enemy"):
+        if self.projectiles is None:
+            return 0
+        hits = self.projectiles.hit(self.entity_rect(collision_with))
+        if hits:
+            self.collision_state = True
+            if self.collision_sound_activated:
+                self.sound_bank.play("collision")
+        return hits
+
+    # creating a particle system for explosions, sparks, smoke and so on
+    # mode "point" draws one pixel per particle, "sprite" draws small circles of the particle size
+    # capacity: the most particles alive at the same time, extra ones are dropped
+    def create_particles(self,capacity=10000,gravity=0,mode="point"):
+        particles = self.particlesystem(capacity=capacity, gravity=gravity, mode=mode)
+        particles.rng = np.random.default_rng(int(self.entities.rng.integers(1 << 62)))  # seeded with the game
+        self.particle_systems.append(particles)
+        return particles
+
+    # a burst of particles flying out in every direction
+    # life is counted like speeds: in frames, or in seconds with run()
+    def explosion(self,xpos,ypos,count=100,color=(255,160,0),speed=4,life=40,size=3,particles=None):
+        if particles is None:
+            if not self.particle_systems:
+                self.create_particles(mode="sprite")
+            particles = self.particle_systems[0]
+        particles.emit(xpos, ypos, count=count, speed=speed, life=life, color=color, size=size, color_jitter=40)
+
+    # drawing all the particle systems
+    def load_particles(self):
+        for particles in self.particle_systems:
+            rect = particles.draw(self.screen, self.camera_offset())
+            if rect is not None:
+                self.mark_dirty(rect)
 
     # assigning collision effects
     def assign_collision_effect(self,type="enemy",effect="disappear"):
@@ -735,89 +1207,189 @@ class sajilopygame:
         self.collision_effect = effect
 
     # assign collision limits
+    # move_to_random leaves out the positions in these x and y bands, (0, 0) for no band
     def limit_randomness(self,type="enemy",xlimit=(0,0),ylimit=(0,0)):
         self.random_xlimit = xlimit
         self.random_ylimit = ylimit
-        lower_xlimit, upper_xlimit = self.random_xlimit
-        upper_ylimit, lower_ylimit = self.random_ylimit
+        space = self.free_spaces.get(type) or self.keep_away(type=type, avoid=())
+        space.set_limits(xlimit, ylimit)
         xpos, ypos = self.find_position(type=type)
-        if lower_xlimit <= xpos <= upper_xlimit or lower_ylimit <= ypos <= upper_ylimit:
+        if space.in_limits(xpos, ypos):
             self.move_to_random(type=type)
 
-    # collision detection
-    def detect_collision(self,collision_by="object",collision_with="enemy"):
-        collision_by_x, collision_by_y = self.find_position(type=collision_by)
-
-        collision_with_x, collision_with_y = self.find_position(type=collision_with)
+    # keeping the random positions of a type away from other entities
+    # avoid: the types (or tags) to stay at least radius pixels away from
+    # the free places are kept in a grid of cell_size cells that follows the entities as they move,
+    # so move_to_random finds a free place in one go however crowded the window gets
+    def keep_away(self,type="enemy",avoid=("player",),radius=0,cell_size=16):
+        space = self.freespace(self, type, avoid=avoid, radius=radius, cell_size=cell_size)
+        old_space = self.free_spaces.get(type)
+        if old_space is not None:
+            space.set_limits(old_space.xlimit, old_space.ylimit)
+        self.free_spaces[type] = space
+        return space
 
-        distance = math.sqrt((math.pow(collision_with_x-collision_by_x,2)) + (math.pow(collision_with_y-collision_by_y,2)))
-        if distance <= 50:  # this i am yet to determine, but i am just giving a threshold at this point
+    # collision detection
+    # the two sprites collide when their rectangles overlap
+    # pixel_perfect compares the masks of the drawn images after the rectangles overlap
+    def detect_collision(self,collision_by="object",collision_with="enemy",pixel_perfect=False):
+        if pixel_perfect:
+            collided = self.detect_pixel_collision(collision_by, collision_with)
+        else:
+            collided = self.entity_rect(collision_by).colliderect(self.entity_rect(collision_with))
+        if collided:
             self.collision_state = True
             # checking for collision sound and activating it
             if self.collision_sound_activated:
-                self.collision_sound = pygame.mixer.Sound(self.collision_sound_path)
-                self.collision_sound.set_volume(self.collision_sound_volume)
-                self.collision_sound.play()
+                self.sound_bank.play("collision")
         else:
             self.collision_state = False
 
     # function to move to random place
     def move_to_random(self, type="enemy"):
-        if type == "player":
-            self.playerx = random.randint(0, self.wwidth - self.player_width)
-            self.playery = random.randint(0, self.wheight - self.player_height)
-        if type == "enemy":
-            self.enemyx = random.randint(0, self.wwidth - self.enemy_width)
-            self.enemyy = random.randint(0, self.wheight - self.enemy_height)
-        if type == "object":
-            self.objectx = random.randint(0, self.wwidth - self.object_width)
-            self.objecty = random.randint(0, self.wheight - self.object_height)
+        ids = self.entity_ids(type)
+        entities = self.entities
+        space = self.free_spaces.get(type)
+        if space is not None:
+            for id in np.atleast_1d(ids).tolist():
+                position = space.sample()
+                if position is None:
+                    print("No free space left to move " + str(type) + " to")
+                    break
+                entities.x[id], entities.y[id] = position
+                space.moved(id)
+        elif isinstance(ids, int):
+            entities.x[ids] = random.randint(0, self.wwidth - int(entities.width[ids]))
+            entities.y[ids] = random.randint(0, self.wheight - int(entities.height[ids]))
+        else:
+            entities.x[ids] = entities.rng.integers(0, self.wwidth - entities.width[ids] + 1)
+            entities.y[ids] = entities.rng.integers(0, self.wheight - entities.height[ids] + 1)
         # checking for sound in randomness and activating it
         if self.random_sound_activated:
-            self.random_sound = pygame.mixer.Sound(self.random_sound_path)
-            self.random_sound.set_volume(self.random_sound_volume)
-            self.random_sound.play()
+            self.sound_bank.play("random")
 
     # display score
     def display_score(self,score=0):
         score = self.collision_count
-        score_font = pygame.font.SysFont("comicsansms", 20)
-        score_text = score_font.render("Score : " + str(score), True, (255, 255, 255))
+        score_text = self.render_text("Score : " + str(score), "comicsansms", 20, (255, 255, 255))
         score_rect = score_text.get_rect()
         score_rect.center = (self.wwidth/2-300, 40)
-        self.screen.blit(score_text, score_rect)
+        self.blit(score_text, score_rect)
 
     # get score
     def get_score(self):
         return self.collision_count
 
     # loading sound
-    def load_sound(self,sound_path=None,type="background",volume=0.5):
+    # effect sounds are decoded once and played through the sound bank
+    # max_voices: how many copies of the effect can play at the same time
+    # min_interval: seconds before the same effect can be played again
+    def load_sound(self,sound_path=None,type="background",volume=0.5,max_voices=2,min_interval=0.05):
         if type == "background":
-            self.background_sound = pygame.mixer.Sound(sound_path)
+            self.background_sound = self.load_sound_file(sound_path)
             self.background_sound.set_volume(volume)
             self.background_sound.play(-1)
+            return
+        sound = self.load_sound_file(sound_path)
+        self.sound_bank.load(type, sound, volume=volume, max_voices=max_voices, min_interval=min_interval)
         if type == "collision":
-            self.collision_sound_path = pygame.mixer.Sound(sound_path)
+            self.collision_sound_path = sound
             self.collision_sound_volume = volume
             self.collision_sound_activated = True
         if type == "random":
-            self.random_sound_path = pygame.mixer.Sound(sound_path)
+            self.random_sound_path = sound
             self.random_sound_volume = volume
             self.random_sound_activated = True
         if type == "trigger":
-            self.trigger_sound_path = pygame.mixer.Sound(sound_path)
+            self.trigger_sound_path = sound
             self.trigger_sound_volume = volume
             self.trigger_sound_activated = True
         if type == "death":
-            self.death_sound_path = pygame.mixer.Sound(sound_path)
+            self.death_sound_path = sound
             self.death_sound_volume = volume
             self.death_sound_activated = True
         if type == "victory":
-            self.victory_sound_path = pygame.mixer.Sound(sound_path)
+            self.victory_sound_path = sound
             self.victory_sound_volume = volume
             self.victory_sound_activated = True
 
+    # a sound decoded once per path
+    # every call gets its own copy of the samples, so that the volumes of two sounds from one file are separate
+    def load_sound_file(self,sound_path):
+        key = self.asset_key(sound_path)
+        sound = self.sound_cache.get(key)
+        if sound is None:
+            sound = pygame.mixer.Sound(sound_path)
+            self.sound_cache[key] = sound
+        return pygame.mixer.Sound(buffer=sound.get_raw())
+
+    # decoding images and sounds on other threads, e.g. while a level is being played
+    # manifest: a list of paths, or {"images": [...], "sounds": [...]}
+    # on_progress(loaded, total) and on_complete() are called on the main thread
+    # later create_player, load_image, load_sound and the others take them from the cache
+    def preload(self,manifest,on_progress=None,on_complete=None,workers=4):
+        if isinstance(manifest, dict):
+            paths = [(path, "image") for path in manifest.get("images", [])] + [(path, "sound") for path in manifest.get("sounds", [])]
+        else:
+            paths = [(path, "sound" if os.path.splitext(path)[1].lower() in self.SOUND_EXTENSIONS else "image") for path in manifest]
+        if self.asset_loader is None:
+            self.asset_loader = self.assetloader(workers=workers)
+        loader = self.asset_loader
+        if on_progress is not None:
+            loader.progress_callbacks.append(on_progress)
+        if on_complete is not None:
+            loader.complete_callbacks.append(on_complete)
+        for path, kind in paths:
+            key = self.asset_key(path)
+            if key not in self.image_cache and key not in self.sound_cache:
+                loader.submit(key, kind)    # by the cache key, so two forms of the same path are decoded once
+        self.update_assets()
+        return loader
+
+    # how much of the preloading is done, from 0 to 1
+    def preload_progress(self):
+        if self.asset_loader is None:
+            return 1.0
+        return self.asset_loader.progress()
+
+    # taking the finished images and sounds from the loader
+    # images are converted here, converting needs the display and only works on the main thread
+    def update_assets(self):
+        loader = self.asset_loader
+        for path, kind, asset in loader.collect():
+            if kind == "image":
+                self.image_cache[path] = asset.convert_alpha()     # the loader's paths are cache keys
+            else:
+                self.sound_cache[path] = asset
+        loader.report()
+        if loader.done():
+            loader.close()
+            self.asset_loader = None
+
+    # a loading screen with a progress bar, shown until everything preloaded is ready
+    def loading_screen(self,text="Loading",font="comicsansms",font_size=40,color=(255,255,255),bar_color=(0,200,120)):
+        while self.asset_loader is not None:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.quit()
+            progress = self.asset_loader.progress()
+            self.screen.fill((0, 0, 0))
+            label = self.render_text("%s %d%%" % (text, progress * 100), font, font_size, color)
+            self.screen.blit(label, label.get_rect(center=(self.wwidth // 2, self.wheight // 2 - 40)))
+            bar = pygame.Rect(0, 0, self.wwidth // 2, 20)
+            bar.center = (self.wwidth // 2, self.wheight // 2 + 20)
+            pygame.draw.rect(self.screen, color, bar, 2)
+            pygame.draw.rect(self.screen, bar_color, (bar.x + 3, bar.y + 3, int((bar.width - 6) * progress), bar.height - 6))
+            pygame.display.update()
+            self.clock.tick(30)
+            self.update_assets()
+        if self.dirty_rendering:
+            self.full_redraw = True
+
+    # played and dropped voices of the sound effects
+    def sound_stats(self):
+        return self.sound_bank.stats()
+
     # update max lives
     def update_max_lives(self,max_lives=3):
         self.max_lives = max_lives
@@ -827,9 +1399,7 @@ class sajilopygame:
         self.lives -= 1
         # checking for sound in trigger and activating it
         if self.death_sound_activated:
-            self.death_sound = pygame.mixer.Sound(self.death_sound_path)
-            self.death_sound.set_volume(self.death_sound_volume)
-            self.death_sound.play()
+            self.sound_bank.play("death")
 
     # increase life
     def increase_life(self):
@@ -838,91 +1408,369 @@ class sajilopygame:
     # display lives
     def display_lives(self,score=0):
         life = self.lives
-        life_font = pygame.font.SysFont("comicsansms", 20)
-        life_text = life_font.render("Lives : " + str(life), True, (255, 255, 255))
+        life_text = self.render_text("Lives : " + str(life), "comicsansms", 20, (255, 255, 255))
         life_rect = life_text.get_rect()
         life_rect.center = (self.wwidth/2-300, 70)
-        self.screen.blit(life_text, life_rect)
+        self.blit(life_text, life_rect)
 
     # game over
+    # the game stops and waits for R (restart) or the close button without using the cpu
     def game_over(self,text="GAME OVER",font="comicsansms",font_size=100,color=(255,0,0)):
+        if self.scene == "game_over":
+            return      # already showing, e.g. called again from the game loop
         print("GAME OVER")
-        gameover_font = pygame.font.SysFont(font,font_size)
-        gameover_text = gameover_font.render(text, True, color)
-        gameover_rect = gameover_text.get_rect()
-        gameover_rect.center = (self.wwidth/2, self.wheight/2)
-        self.screen.blit(gameover_text, gameover_rect)
         pygame.mixer.music.stop()
         pygame.mixer.stop()
-        # Update the display after rendering
-        pygame.display.update()
-        # killing the program
-        self.game_over_state = True
-        while self.game_over_state:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.game_over_state = False  # Exit the pause loop without quitting the application
+        self.change_scene("game_over", text, font, font_size, color)
 
-    # game over
+    # game won
     def you_won(self, text="You Won!", font="comicsansms", font_size=100, color=(255, 0, 0)):
+        if self.scene == "won":
+            return      # already showing, e.g. called again from the game loop
         print("You Won!")
-        gameover_font = pygame.font.SysFont(font, font_size)
-        gameover_text = gameover_font.render(text, True, color)
-        gameover_rect = gameover_text.get_rect()
-        gameover_rect.center = (self.wwidth / 2, self.wheight / 2)
-        self.screen.blit(gameover_text, gameover_rect)
         pygame.mixer.music.stop()
         pygame.mixer.stop()
-        # Update the display after rendering
+        if self.victory_sound_activated:
+            self.sound_bank.play("victory")
+        self.change_scene("won", text, font, font_size, color)
+
+    # pausing the game, P pauses and resumes too
+    def pause(self, text="PAUSED", font="comicsansms", font_size=100, color=(255, 255, 255)):
+        if self.scene == "playing":
+            pygame.mixer.pause()
+            self.change_scene("paused", text, font, font_size, color)
+
+    # resuming a paused game
+    def resume(self):
+        if self.scene == "paused":
+            pygame.mixer.unpause()
+            self.leave_scene()
+
+    # switching to a still scene (paused, game over, won)
+    # the frame is drawn once with the text on top and kept until the scene changes
+    def change_scene(self, scene, text, font, font_size, color):
+        if self.scene == "playing":
+            self.scene_started = self.now()
+        self.scene = scene
+        self.game_over_state = scene in ("game_over", "won")
+        self.scene_surface = self.screen.copy()
+        scene_text = self.render_text(text, font, font_size, color)
+        scene_rect = scene_text.get_rect()
+        scene_rect.center = (self.wwidth / 2, self.wheight / 2)
+        self.scene_surface.blit(scene_text, scene_rect)
+        self.show_scene()
+
+    # putting the kept scene on the display
+    def show_scene(self):
+        self.screen.blit(self.scene_surface, (0, 0))
         pygame.display.update()
-        # killing the program
-        self.game_over_state = True
-        while self.game_over_state:
-            for event in pygame.event.get():
+
+    # going back to playing
+    def leave_scene(self):
+        if self.scene_started is not None:
+            # the timer wheel starts later by the time spent in the scene, so no timers are due at once
+            self.scheduler.start += self.now() - self.scene_started
+            self.scene_started = None
+        self.scene = "playing"
+        if self.dirty_rendering and self.background_layer is not None:
+            # the scene text is still on the window, only a full redraw removes it
+            self.screen.blit(self.background_layer, (0, 0))
+            self.full_redraw = True
+
+    # waiting in a still scene
+    # blocks on the event queue for a while instead of spinning, so the cpu stays free
+    def idle_scene(self):
+        # nothing is presented in a still scene, so what the game loop drew is not kept for the next erase
+        self.dirty_rects.clear()
+        if self.replayer is not None:
+            pygame.event.get()
+            presses = self.replayer.next_frame(self)
+            events = []
+        elif self.headless:
+            events = pygame.event.get()
+        else:
+            event = pygame.event.wait(self.idle_wait)
+            events = [event] + pygame.event.get()
+        if self.headless:
+            self.clock.tick(self.fps)
+        if self.replayer is None:
+            presses = []
+            for event in events:
                 if event.type == pygame.QUIT:
-                    self.game_over_state = False  # Exit the pause loop without quitting the application
+                    presses.append("quit")
+                if event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                    self.show_scene()
+                if event.type == pygame.KEYDOWN and event.key in self.key_bindings:
+                    presses.append(self.key_bindings[event.key])
+            if self.recorder is not None:
+                self.recorder.frame(self.frame_now, {}, presses)
+        self.advance_frame_time()
+        for action in presses:
+            if action == "quit":
+                self.quit()
+            if action == "pause" and self.scene == "paused":
+                self.resume()
+            if action == "restart" and self.game_over_state:
+                self.restart()
+
+    # starting the game again without closing the window
+    def restart(self):
+        self.leave_scene()
+        self.game_over_state = False
+        self.lives = self.max_lives
+        self.collision_count = 0
+        self.collision_state = False
+        self.triggered_state = False
+        self.end_trigger = False
+        self.left_pressed = self.right_pressed = self.up_pressed = self.down_pressed = False
+        self.trigger_pressed = False
+        for type, org in self.start_positions.items():
+            self.update_position(type=type, xpos=org[0], ypos=org[1])
+        if self.background_sound is not None:
+            self.background_sound.play(-1)
+        for callback in self.restart_callbacks:
+            callback()
+
+    # calling a function when the game restarts, e.g. to reset your own variables
+    def on_restart(self, callback):
+        self.restart_callbacks.append(callback)
 
     # drawing text
     def draw_text(self,text="your text here",font="comicsansms",font_size=20,color=(255,255,255),xpos=0,ypos=0):
-        font = pygame.font.SysFont(font, font_size)
-        text = font.render(text, True, color)
+        text = self.render_text(text, font, font_size, color)
         text_rect = text.get_rect()
         text_rect.topleft = (xpos, ypos)
-        self.screen.blit(text, text_rect)
+        self.blit(text, text_rect)
+
+    # getting a font, each (name, size) is created only once
+    def get_font(self,font="comicsansms",font_size=20):
+        key = (font, font_size)
+        if key not in self.fonts:
+            self.fonts[key] = pygame.font.SysFont(font, font_size)
+        return self.fonts[key]
+
+    # rendering a text, unchanged texts are reused from the text cache
+    def render_text(self,text,font="comicsansms",font_size=20,color=(255,255,255),antialias=True):
+        key = (text, font, font_size, tuple(color), antialias)
+        text_surface = self.text_cache.get(key)
+        if text_surface is None:
+            text_surface = self.get_font(font, font_size).render(text, antialias, color)
+            self.text_cache.put(key, text_surface)
+        return text_surface
+
+    # setting how many rendered texts are kept
+    def set_text_cache_size(self,max_size=256):
+        self.text_cache.resize(max_size)
+
+    # hits, misses and size of the text cache
+    def text_cache_stats(self):
+        return self.text_cache.stats()
 
     # tranformations
+    # the entity is drawn transformed in place of load_player/load_enemy/load_object
+    # every transformed image is made once and kept in the transform cache
     def transform(self,type="player",style="flip_horizontally",angle=None,factor=None):
-        transformed_img = None  # setting local variable
-        if type == "player":
+        if style == "rotate" and angle is None:
+            print("angle not specified")
+            return
+        if style == "scale" and factor is None:
+            print("scaling factor not specified")
+            return
+        if style not in ("flip_horizontally", "flip_vertically", "rotate", "scale"):
+            print("incorrect style option")
+            return
+        ids = self.entity_ids(type)
+        if not isinstance(ids, int):
+            # a tag: every entity with it is drawn transformed, in place of load_entities
+            for id in ids.tolist():
+                if self.entities.images[id] is not None:
+                    self.transform(id, style, angle, factor)
+            return
+        image = self.entity_image(type)
+        transformed_img = self.transformed_image(image, style, angle, factor)
+        if type in self.named_entities:
+            setattr(self, type + "_transformed", True)
+        # rotating grows the image, keeping the same center stops it from wobbling
+        if style == "rotate":
+            position = transformed_img.get_rect(center=self.entity_rect(type).center).topleft
+        else:
+            position = self.find_position(type=type)
+        self.blit(transformed_img, self.to_screen(position))
+        if type in self.named_entities:
+            self.drawn_images[type] = (transformed_img, position)
+
+    # the image an entity is drawn with
+    def entity_image(self,type="player"):
+        if type in self.named_entities:
+            return getattr(self, type + "_img")
+        return self.entities.images[self.entity_ids(type)]
+
+    # a flipped, rotated or scaled image from the transform cache
+    # angles are rounded to one of rotation_steps angles
+    def transformed_image(self,image,style="flip_horizontally",angle=None,factor=None):
+        if style == "rotate":
+            step = 360 / self.rotation_steps
+            angle = round(angle / step) % self.rotation_steps * step
+        if style == "scale":
+            factor = round(factor, 2)
+        key = (image, style, angle, factor)
+        transformed_img = self.transform_cache.get(key)
+        if transformed_img is None:
             if style == "flip_horizontally":
-                transformed_img = pygame.transform.flip(self.player_img, True, False)
-                self.player_transformed = True
+                transformed_img = pygame.transform.flip(image, True, False)
             elif style == "flip_vertically":
-                transformed_img = pygame.transform.flip(self.player_img, False, True)
-                self.player_transformed = True
+                transformed_img = pygame.transform.flip(image, False, True)
             elif style == "rotate":
-                if angle is None:
-                    print("angle not specified")
-                    return
-                transformed_img = pygame.transform.rotate(self.player_img, angle)
-                self.player_transformed = True
-            elif style == "scale":
-                if factor is None:
-                    print("scaling factor not specified")
-                    return
-                new_width = int(self.player_img.get_width() * factor)
-                new_height = int(self.player_img.get_height() * factor)
-                transformed_img = pygame.transform.smoothscale(self.player_img, (new_width, new_height))
+                transformed_img = pygame.transform.rotate(image, angle)
             else:
-                print("incorrect style option")
-        self.screen.blit(transformed_img, (self.playerx, self.playery))
-        pygame.display.flip()
+                new_width = int(image.get_width() * factor)
+                new_height = int(image.get_height() * factor)
+                transformed_img = pygame.transform.smoothscale(image, (new_width, new_height))
+            self.transform_cache.put(key, transformed_img)
+        return transformed_img
+
+    # making every rotation of an entity up front, e.g. 64 angles
+    # later rotations are rounded to these angles and never rotate an image again
+    def precompute_rotations(self,type="player",steps=64):
+        self.rotation_steps = steps
+        image = self.entity_image(type)
+        if self.transform_cache.max_size < len(self.transform_cache) + steps:
+            self.transform_cache.resize(len(self.transform_cache) + steps)
+        for i in range(steps):
+            self.transformed_image(image, "rotate", i * 360 / steps)
+
+    # setting how many transformed images are kept
+    def set_transform_cache_size(self,max_size=512):
+        self.transform_cache.resize(max_size)
+
+    # timing every phase of the frame
+    # window: how many frames are kept, overlay: drawing the frame times on the window
+    def enable_profiler(self,window=240,overlay=True):
+        self.profiler = self.frameprofiler(window=window, overlay=overlay)
+
+    # turning off the profiler, it costs nothing when off
+    def disable_profiler(self):
+        self.profiler = None
+
+    # average milliseconds of every phase over the profiler window
+    def profiler_summary(self):
+        if self.profiler is None:
+            return {}
+        return self.profiler.summary()
+
+    # saving the profiler samples to a .csv or .json file
+    def export_profile(self,file_path="profile.csv"):
+        if self.profiler is None:
+            print("profiler not enabled")
+            return
+        if file_path.endswith(".json"):
+            self.profiler.export_json(file_path)
+        else:
+            self.profiler.export_csv(file_path)
+
+    # drawing the frame time bars in the top right corner
+    def draw_profiler_overlay(self):
+        profiler = self.profiler
+        overlay = profiler.overlay_surface()
+        position = (self.wwidth - overlay.get_width() - 10, 10)
+        self.blit(overlay, position)
+        if profiler.frames % 30 == 1:
+            summary = profiler.summary()
+            profiler.label = "%.1f ms  %d fps" % (summary["total"], 1000 / summary["total"] if summary["total"] else 0)
+        if profiler.label:
+            self.blit(self.render_text(profiler.label, "consolas", 14, (255, 255, 255)), (position[0], position[1] + overlay.get_height() + 2))
+
+    # the time in seconds, the virtual time of the clock in headless mode
+    def now(self):
+        if self.frame_now is not None:
+            return self.frame_now
+        if self.headless:
+            return self.clock.time / 1000
+        return time.perf_counter()
+
+    # closing the window and ending the program, a recording is saved first
+    def quit(self):
+        if self.replayer is not None:
+            self.finish_replay()
+        if self.recorder is not None and not self.recorder.quit_pressed:
+            # a quit from the script is saved as a quit press, so the replay ends on the same frame
+            self.recorder.frame(self.frame_now, self.actions, ["quit"])
+        self.stop_recording()
+        pygame.quit()
+        exit()
+
+    # seeding every random number generator, so that a recorded session can be played again
+    def seed_randomness(self,seed):
+        random.seed(seed)
+        self.entities.rng = np.random.default_rng(seed)
+
+    # moving the frame time on, once per frame
+    # recording: the time is taken from the clock, replaying: from the recording
+    def advance_frame_time(self):
+        if self.recorder is not None:
+            self.frame_now = None
+            self.frame_now = self.now()
+        elif self.replayer is not None:
+            self.frame_now = self.replayer.next_time(self.frame_now)
+
+    # saving the end of the recording
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close(self.state_checksum())
+            self.recorder = None
+
+    # a number made from the positions, the score and the lives
+    # the same session played again gives the same number
+    def state_checksum(self):
+        count = self.entities.count
+        state = self.entities.x[:count].tobytes() + self.entities.y[:count].tobytes()
+        return zlib.crc32(state + repr((self.collision_count, self.lives)).encode())
+
+    # the end of a replay: how fast it ran and whether it ended like the recording
+    # with SAJILOPYTHON_PROFILE set, the profiler samples of the replay are saved to that file
+    # the program ends with exit code 1 when the replay differs
+    def finish_replay(self):
+        replayer = self.replayer
+        if replayer is None:
+            return
+        self.replayer = None
+        seconds = time.perf_counter() - replayer.started
+        print("replayed %d frames in %.2f s (%.0f fps)" % (replayer.frames, seconds, replayer.frames / seconds if seconds else 0))
+        matches = replayer.checksum is None or replayer.checksum == self.state_checksum()
+        if replayer.checksum is not None:
+            print("replay matches the recording" if matches else "replay differs from the recording")
+        profile_path = os.environ.get("SAJILOPYTHON_PROFILE")
+        if profile_path and self.profiler is not None:
+            self.export_profile(profile_path)
+        pygame.quit()
+        if not matches:
+            sys.stdout.flush()
+            os._exit(1)     # exit() is ignored when called from atexit
 
     # setting the fps of the screen
     def set_fps(self,fps=60):
         self.fps = fps
 
+    # calling a function once after some seconds, without stopping the game
+    # returns a timer, timer.cancel() stops it
+    def after(self,seconds,function,*args):
+        return self.scheduler.after(seconds, function, *args)
+
+    # calling a function every few seconds, without stopping the game
+    def every(self,seconds,function,*args):
+        return self.scheduler.every(seconds, function, *args)
+
+    # running a script that can wait, e.g.
+    #   def spawn():
+    #       while True:
+    #           game.move_to_random("enemy")
+    #           yield wait(2)
+    #   game.start_script(spawn())
+    def start_script(self,script):
+        return self.scheduler.start_script(script)
+
     # setting a delay on the screen(in seconds
+    # this stops the whole game, after() and every() do not
     def delay_screen_refresh(self,delay=1):
         # turning milliseconds to seconds
         delay = delay*1000
@@ -930,27 +1778,27 @@ class sajilopygame:
 
     # drawing a line
     def draw_line(self,start=(0,0),end=(0,0),color=(255,255,255),width=1):
-        pygame.draw.line(self.screen, color, start, end, width)
+        self.mark_dirty(pygame.draw.line(self.screen, color, start, end, width))
 
     # drawing a rect
     def draw_rect(self,color=(255,255,255),org=(50,50),width=100,height=100,border_thickness=0,border_radius=0):
         xpos, ypos = org
         rect = (xpos,ypos,width,height)
-        pygame.draw.rect(self.screen, color=color, rect=rect, width=border_thickness, border_radius=border_radius)
+        self.mark_dirty(pygame.draw.rect(self.screen, color=color, rect=rect, width=border_thickness, border_radius=border_radius))
 
     # drawing an arc
     def draw_arc(self,color=(255,255,255),org=(10,10),width=100,height=100,start_angle=0,stop_angle=90,border_thickness=0):
         rect = (org[0],org[1],width,height)
         start_angle = math.radians(start_angle) # for clockwise start_angle must be bigger than stop_angle
         stop_angle = math.radians(stop_angle)   # for anti-clockwise start_angle must be smaller than stop_angle
-        pygame.draw.arc(self.screen, color=color, rect=rect, start_angle=start_angle, stop_angle=stop_angle, width=border_thickness)
+        self.mark_dirty(pygame.draw.arc(self.screen, color=color, rect=rect, start_angle=start_angle, stop_angle=stop_angle, width=border_thickness))
 
     # drawing a polygon
     def draw_polygon(self,color=(255,255,255),points=None,border_thickness=0):
         if points is None:
             print("points not specified")
             return
-        pygame.draw.polygon(self.screen, color=color, points=points, width=border_thickness)
+        self.mark_dirty(pygame.draw.polygon(self.screen, color=color, points=points, width=border_thickness))
 
     # giving a random integer number
     def random_number(self,start=0,end=10):
@@ -964,12 +1812,396 @@ class sajilopygame:
 
     # detecting collision between two characters
     def detect_character_collision(self,obj1, obj2):
-        return (
-                obj1.xpos < obj2.xpos + obj2.width and
-                obj1.xpos + obj1.width > obj2.xpos and
-                obj1.ypos < obj2.ypos + obj2.height and
-                obj1.ypos + obj1.height > obj2.ypos
-        )
+        return obj1.get_rect().colliderect(obj2.get_rect())
+
+    # the mask of an image, made once per image (and per transformed image)
+    def get_mask(self,image):
+        mask = self.mask_cache.get(image)
+        if mask is None:
+            mask = pygame.mask.from_surface(image)
+            self.mask_cache[image] = mask
+        return mask
+
+    # the image and rectangle of a character, or of an entity as it was last drawn
+    # shape characters have no image (None), they fill their whole rectangle
+    def collision_image(self,sprite):
+        if isinstance(sprite, self.character):
+            if sprite.type == "image" and sprite.image is not None:
+                return sprite.image, sprite.get_rect()
+            return None, sprite.get_rect()
+        drawn = self.drawn_images.get(sprite)
+        if isinstance(drawn, tuple):    # transformed, drawn somewhere else than its position
+            image, position = drawn
+            return image, image.get_rect(topleft=position)
+        image = drawn if drawn is not None else self.entity_image(sprite)
+        return image, image.get_rect(topleft=self.find_position(type=sprite))
+
+    # the mask of a collision image, a filled mask of the rectangle's size for a shape
+    def collision_mask(self,image,rect):
+        if image is not None:
+            return self.get_mask(image)
+        mask = self.filled_masks.get(rect.size)
+        if mask is None:
+            mask = self.filled_masks[rect.size] = pygame.mask.Mask(rect.size, fill=True)
+        return mask
+
+    # the mask and rectangle of a character, or of an entity as it was last drawn
+    def collision_shape(self,sprite):
+        image, rect = self.collision_image(sprite)
+        return self.collision_mask(image, rect), rect
+
+    # pixel perfect collision between two characters or entities
+    # the masks are only compared when the rectangles overlap
+    def detect_pixel_collision(self,sprite1,sprite2):
+        image1, rect1 = self.collision_image(sprite1)
+        image2, rect2 = self.collision_image(sprite2)
+        if not rect1.colliderect(rect2):
+            return False
+        if image1 is None and image2 is None:
+            return True     # two filled shapes touch when their rectangles do
+        mask1 = self.collision_mask(image1, rect1)
+        mask2 = self.collision_mask(image2, rect2)
+        return mask1.overlap(mask2, (rect2.x - rect1.x, rect2.y - rect1.y)) is not None
+
+    # the sprites from a list that touch a sprite, pixel perfect
+    def pixel_collisions(self,sprite,others):
+        image, rect = self.collision_image(sprite)
+        shapes = [self.collision_image(other) for other in others]
+        mask = None
+        hits = []
+        for i in rect.collidelistall([other_rect for other_image, other_rect in shapes]):
+            other_image, other_rect = shapes[i]
+            if image is None and other_image is None:
+                hits.append(others[i])
+                continue
+            if mask is None:
+                mask = self.collision_mask(image, rect)
+            other_mask = self.collision_mask(other_image, other_rect)
+            if mask.overlap(other_mask, (other_rect.x - rect.x, other_rect.y - rect.y)) is not None:
+                hits.append(others[i])
+        return hits
+
+    # the physics toggles of the Sajilo Python Playground settings
+    # the playground passes them to the game in SAJILOPYTHON_PHYSICS, or they are read from its config file
+    def physics_settings(self):
+        settings = dict.fromkeys(("gravity", "wall", "collision", "boundary"), False)
+        try:
+            if os.environ.get("SAJILOPYTHON_PHYSICS"):
+                settings.update(json.loads(os.environ["SAJILOPYTHON_PHYSICS"]))
+            elif os.path.exists(self.CONFIG_FILE):
+                with open(self.CONFIG_FILE, "r") as file:
+                    settings.update(json.load(file).get("physics", {}))
+        except (OSError, ValueError, AttributeError):
+            print("physics settings could not be read")
+        return settings
+
+    # turning on the physics world
+    # gravity, wall, collision and boundary are taken from the playground settings unless they are given here
+    # gravity: pulls the bodies down, wall: bodies hit the walls, collision: bodies hit each other,
+    # boundary: bodies stay inside the window (or bounds)
+    # speeds are in pixels per second, gravity_strength in pixels per second per second
+    def enable_physics(self,gravity=None,wall=None,collision=None,boundary=None,gravity_strength=900,bounds=None,step=1/120):
+        settings = self.physics_settings()
+        for name, value in (("gravity", gravity), ("wall", wall), ("collision", collision), ("boundary", boundary)):
+            if value is not None:
+                settings[name] = value
+        self.physics = self.physicsworld(self, settings, gravity_strength=gravity_strength,
+                                         bounds=bounds or (self.wwidth, self.wheight), step=step)
+        self.physics_clock = None
+        return self.physics
+
+    def disable_physics(self):
+        self.physics = None
+
+    # giving an entity (name, id or tag) or a character a body in the physics world
+    # shape: "box" or "circle", a static body never moves
+    # returns the body, or a list of bodies for a tag
+    def add_body(self,type="player",shape="box",mass=1,restitution=0.5,friction=0.2,velocity=(0,0),static=False):
+        if self.physics is None:
+            self.enable_physics()
+        if shape not in ("box", "circle"):
+            print("incorrect shape option")
+            return None
+        ids = type if isinstance(type, self.character) else self.entity_ids(type)
+        bodies = []
+        for target in ids.tolist() if isinstance(ids, np.ndarray) else [ids]:
+            body = self.physicsbody(target, shape, mass, restitution, friction, static)
+            body.vx, body.vy = velocity
+            self.physics.add(body)
+            bodies.append(body)
+        return bodies if isinstance(ids, np.ndarray) else bodies[0]
+
+    # removing the bodies of an entity or character
+    def remove_body(self,type="player"):
+        if self.physics is None:
+            return
+        ids = type if isinstance(type, self.character) else self.entity_ids(type)
+        targets = set(ids.tolist()) if isinstance(ids, np.ndarray) else {ids}
+        self.physics.remove(lambda body: body.target in targets)
+
+    # a static wall, e.g. the ground: add_wall((0, 560, 800, 40))
+    def add_wall(self,rect):
+        if self.physics is None:
+            self.enable_physics()
+        return self.physics.add_wall(pygame.Rect(rect))
+
+    # pushing a body, the impulse is divided by its mass
+    def apply_impulse(self,body,impulse=(0,0)):
+        body.apply_impulse(*impulse)
+
+    # drawing the walls, e.g. to see where they are
+    def draw_walls(self,color=(120,120,120)):
+        if self.physics is None:
+            return
+        for wall in self.physics.walls:
+            self.mark_dirty(pygame.draw.rect(self.screen, color, pygame.Rect(self.to_screen((wall.x, wall.y)), (wall.width, wall.height))))
+
+    # drawing many characters with one blits call
+    # dead characters and shapes other than rectangles are skipped
+    def load_characters(self,characters):
+        sequence = [(character.surface(), (character.xpos, character.ypos)) for character in characters
+                    if character.alive and (character.type == "image" or character.character_shape == "rectangle")]
+        if self.dirty_rendering:
+            self.dirty_rects.extend(self.screen.blits(sequence))
+        else:
+            self.screen.blits(sequence, False)
+
+    # a rectangle drawn once on its own surface, so that it can be blitted with images
+    def shape_surface(self,color,width,height,border_thickness=0,border_radius=0):
+        key = (tuple(color), width, height, border_thickness, border_radius)
+        surface = self.shape_cache.get(key)
+        if surface is None:
+            surface = pygame.Surface((width, height), pygame.SRCALPHA)
+            pygame.draw.rect(surface, color, (0, 0, width, height), width=border_thickness, border_radius=border_radius)
+            self.shape_cache.put(key, surface)
+        return surface
+
+    # creating a collision world for many characters
+    # the world is updated on every refresh_window
+    # pixel_perfect compares the masks of the characters whose rectangles overlap
+    def collision_world(self,cell_size=64,pixel_perfect=False):
+        world = self.collisionworld(self, cell_size=cell_size, pixel_perfect=pixel_perfect)
+        self.collision_worlds.append(world)
+        return world
+
+    # packing every image of a folder into a few big images (pages)
+    # the packing is saved in a .atlas folder inside the folder, later runs load it instead of packing again
+    # after this, load_image, create_entity and the others get the images from the atlas
+    def load_atlas(self,folder,max_size=2048,padding=1):
+        folder = os.path.abspath(folder)
+        atlas = self.atlases.get(folder)
+        if atlas is not None:
+            return atlas
+        if not os.path.isdir(folder):
+            print("atlas folder not found")
+            return None
+        names = sorted(name for name in os.listdir(folder)
+                       if os.path.splitext(name)[1].lower() in self.ATLAS_EXTENSIONS and os.path.isfile(os.path.join(folder, name)))
+        # the names, sizes and modification times of the images, the saved packing is used when they are the same
+        signature = [[name, os.path.getsize(os.path.join(folder, name)), os.stat(os.path.join(folder, name)).st_mtime_ns] for name in names]
+        signature.append([max_size, padding])
+        cache_folder = os.path.join(folder, ".atlas")
+        atlas = self.textureatlas.load(cache_folder, signature)
+        if atlas is None:
+            images = {name: pygame.image.load(os.path.join(folder, name)).convert_alpha() for name in names}
+            atlas = self.textureatlas.pack(images, max_size=max_size, padding=padding)
+            try:
+                atlas.save(cache_folder, signature)
+            except OSError:
+                print("atlas could not be saved")      # a read only folder, packing again next time
+        for name in atlas.index:
+            self.image_cache[self.asset_key(os.path.join(folder, name))] = atlas.image(name)
+        self.atlases[folder] = atlas
+        return atlas
+
+    # drawing many images from an atlas with one call
+    # sprites: (name, position) pairs, the names are the file names in the atlas folder
+    def draw_sprites(self,atlas,sprites):
+        offset = self.camera_offset()
+        sequence = atlas.blit_sequence(sprites, offset)
+        if self.dirty_rendering:
+            self.dirty_rects.extend(self.screen.blits(sequence))
+        else:
+            self.screen.blits(sequence, False)
+
+    # cutting a sprite sheet into frames, once per sheet
+    # the frames are subsurfaces, they share the pixels of the sheet
+    # margin: space around the sheet, spacing: space between the frames
+    def load_sprite_sheet(self,image_path,frame_width,frame_height,margin=0,spacing=0):
+        key = (image_path, frame_width, frame_height, margin, spacing)
+        frames = self.sprite_sheets.get(key)
+        if frames is None:
+            sheet = self.load_image(image_path)
+            sheet_width, sheet_height = sheet.get_size()
+            frames = []
+            for ypos in range(margin, sheet_height - margin - frame_height + 1, frame_height + spacing):
+                for xpos in range(margin, sheet_width - margin - frame_width + 1, frame_width + spacing):
+                    frames.append(sheet.subsurface((xpos, ypos, frame_width, frame_height)))
+            self.sprite_sheets[key] = frames
+        return frames
+
+    # adding an animation clip to an entity (name, id or tag) or a character
+    # frames: a list of images or image paths, e.g. from load_sprite_sheet
+    # mode: "loop", "once" (stops on the last frame) or "pingpong" (goes back and forth)
+    # the first clip added starts playing
+    def add_animation(self,type="player",name="idle",frames=None,fps=10,mode="loop"):
+        if not frames:
+            print("frames not specified")
+            return
+        if mode not in ("loop", "once", "pingpong"):
+            print("incorrect mode option")
+            return
+        frames = [self.load_image(frame) if isinstance(frame, str) else frame for frame in frames]
+        animation = self.animations.get(type)
+        if animation is None:
+            animation = self.animations[type] = self.spriteanimation()
+            if isinstance(type, self.character):
+                type.animation = animation
+        animation.add(name, frames, fps, mode)
+        if animation.clip is None:
+            animation.play(name)
+            self.apply_animation(type, animation)
+
+    # switching the clip of an entity or character, a clip that is already playing goes on
+    def play_animation(self,type="player",name="idle",restart=False):
+        animation = self.animations.get(type)
+        if animation is None or name not in animation.clips:
+            print("animation not found")
+            return
+        animation.play(name, restart)
+        self.apply_animation(type, animation)
+
+    # stopping the animation of an entity or character, it keeps its current frame
+    def remove_animation(self,type="player"):
+        animation = self.animations.pop(type, None)
+        if animation is not None and isinstance(type, self.character):
+            type.animation = None
+
+    # whether a clip played with mode="once" has reached its last frame
+    def animation_finished(self,type="player"):
+        animation = self.animations.get(type)
+        return animation is not None and animation.finished
+
+    # moving every animation on by the elapsed time
+    # with run() the animations move by the fixed step, so they are the same on every computer
+    def update_animations(self,elapsed=None):
+        now = self.now()
+        if elapsed is None:
+            elapsed = self.elapsed_since(self.animation_clock, now)
+        self.animation_clock = now
+        for type, animation in self.animations.items():
+            if animation.update(elapsed):
+                self.apply_animation(type, animation)
+
+    # the seconds since an earlier now(), or the fixed step inside run()
+    def elapsed_since(self,previous,now):
+        if self.running:
+            return self.time_scale
+        if previous is None:
+            return 0
+        return min(now - previous, 0.25)    # not jumping ahead after a pause
+
+    # giving the current frame to whatever draws the entity
+    def apply_animation(self,type,animation):
+        if isinstance(type, self.character):
+            return      # a character takes its frame when it is loaded
+        image = animation.image()
+        ids = self.entity_ids(type)
+        entities = self.entities
+        if type in self.named_entities:
+            setattr(self, type + "_img", image)     # load_player and the others draw it
+        elif isinstance(ids, int):
+            entities.images[ids] = image
+        else:
+            for id in ids.tolist():
+                entities.images[id] = image
+        entities.width[ids], entities.height[ids] = image.get_size()
+
+    # creating a camera the size of the window
+    # bounds: (width, height) of the world, the camera does not look outside of it
+    # once created, the players, entities, projectiles and particles are drawn through it
+    def create_camera(self,org=(0,0),bounds=None):
+        self.camera = self.gamecamera(self.wwidth, self.wheight, org=org, bounds=bounds)
+        return self.camera
+
+    # removing the camera, positions are window positions again
+    def remove_camera(self):
+        self.camera = None
+
+    # keeping an entity in the middle of the camera
+    # smoothing: 1 jumps to it, smaller values catch up slowly
+    def follow(self,type="player",smoothing=1):
+        if self.camera is None:
+            self.create_camera()
+        self.camera.follow(self.entity_rect(type), smoothing)
+
+    # how much the camera moves the world when drawing it
+    def camera_offset(self):
+        if self.camera is None:
+            return 0, 0
+        return self.camera.offset()
+
+    # a position in the world to a position on the window
+    def to_screen(self,position):
+        if self.camera is None:
+            return position
+        return self.camera.to_screen(*position)
+
+    # a position on the window (e.g. the mouse) to a position in the world
+    def to_world(self,position):
+        if self.camera is None:
+            return position
+        return self.camera.to_world(*position)
+
+    # where an entity is on the window
+    def screen_position(self,type="player"):
+        return self.to_screen(self.find_position(type=type))
+
+    # loading a tilemap from a list of rows, a .csv file or a .json file
+    # tiles: what every tile value looks like, an image path or a color, e.g. {1: "grass.png", 2: (90, 60, 30)}
+    # values that are not in tiles are left empty
+    def load_tilemap(self,grid,tiles=None,tile_size=32,chunk_size=256):
+        if isinstance(grid, str):
+            grid = self.read_tile_grid(grid)
+            if grid is None:
+                return None
+        images = {}
+        for value, tile in (tiles or {}).items():
+            if isinstance(tile, str):
+                image = self.load_image(tile)
+                if image.get_size() != (tile_size, tile_size):
+                    image = pygame.transform.scale(image, (tile_size, tile_size))
+            else:
+                image = pygame.Surface((tile_size, tile_size)).convert()
+                image.fill(tile)
+            images[value] = image
+        return self.tilemap(grid, images, tile_size=tile_size, chunk_size=chunk_size)
+
+    # reading the rows of a tilemap file, numbers are turned into ints
+    def read_tile_grid(self,file_path):
+        if not os.path.exists(file_path):
+            print("tilemap file not found")
+            return None
+        if file_path.endswith(".json"):
+            with open(file_path, "r") as file:
+                grid = json.load(file)
+            if isinstance(grid, dict):
+                grid = grid.get("grid", [])
+            return grid
+        grid = []
+        with open(file_path, "r", newline="") as file:
+            for row in csv.reader(file):
+                grid.append([int(cell) if cell.strip().lstrip("-").isdigit() else (cell.strip() or None) for cell in row])
+        return grid
+
+    # drawing the part of a tilemap the camera sees
+    def draw_tilemap(self,tilemap):
+        if self.camera is None:
+            view = self.screen.get_rect()
+        else:
+            view = self.camera.rect()
+        for rect in tilemap.draw(self.screen, view):
+            self.mark_dirty(rect)
 
     # saving highest score
     def save_highest_score(self,score=0):
@@ -985,6 +2217,10 @@ class sajilopygame:
 
     # a new class for characters
     class character:
+        # a fixed layout instead of a __dict__, thousands of characters stay small
+        __slots__ = ("parent", "type", "image_path", "image", "image_rect", "loaded_path", "animation", "character_shape", "color",
+                     "xpos", "ypos", "width", "height", "border_thickness", "border_radius", "speed", "alive")
+
         def __init__(self, parent, type="shape", image_path="image_path", character_shape="rectangle", color=(255, 0, 0), org=(0, 0), width=30,
                      height=30, border_thickness=0, border_radius=0):
             self.parent = parent
@@ -992,6 +2228,8 @@ class sajilopygame:
             self.image_path = image_path
             self.image = None
             self.image_rect = None
+            self.loaded_path = None     # the path self.image was loaded from
+            self.animation = None
             self.character_shape = character_shape
             self.color = color
             self.xpos, self.ypos = org
@@ -1016,15 +2254,36 @@ class sajilopygame:
         def load(self):
             self.check_vitals()
             if self.type == "image":
-                self.image = pygame.image.load(self.image_path)
-                self.image_rect = self.image.get_rect()
-                self.parent.screen.blit(self.image,(self.xpos,self.ypos))
+                self.parent.blit(self.surface(), (self.xpos, self.ypos))
             elif self.type == "shape":
                 if self.character_shape == "rectangle":
                     player = self.parent.draw_rect(color=self.color, org=(self.xpos, self.ypos), width=self.width,
                                                    height=self.height, border_thickness=self.border_thickness,
                                                    border_radius=self.border_radius)
 
+        # the image the character is drawn with
+        # images come from the image cache of the game, they are decoded once for all the characters
+        def surface(self):
+            if self.type == "image":
+                if self.animation is not None:
+                    self.image = self.animation.image()
+                    self.loaded_path = None
+                    self.image_rect = self.image.get_rect()
+                elif self.loaded_path != self.image_path:
+                    # looked up once, and again only when image_path is changed
+                    self.image = self.parent.load_image(self.image_path)
+                    self.loaded_path = self.image_path
+                    self.image_rect = self.image.get_rect()
+                return self.image
+            return self.parent.shape_surface(self.color, self.width, self.height, self.border_thickness, self.border_radius)
+
+        # the rectangle the character covers on the screen
+        def get_rect(self):
+            if self.type == "image" and self.image is not None:
+                width, height = self.image.get_size()
+                return pygame.Rect(self.xpos, self.ypos, width, height)
+            return pygame.Rect(self.xpos, self.ypos, self.width, self.height)
+
         def change_position(self, xpos, ypos):
             self.check_vitals()
             if self.type == "image":
@@ -1041,13 +2300,13 @@ class sajilopygame:
 
         def move_left(self):
             self.check_vitals()
-            self.xpos -= 10
+            self.xpos -= 10 * self.parent.time_scale
 
         def move_right(self, speed=None):
             self.check_vitals()
             if speed:
                 self.speed = speed
-            self.xpos += self.speed
+            self.xpos += self.speed * self.parent.time_scale
 
         def find_position(self):
             self.check_vitals()
@@ -1092,4 +2351,1562 @@ class sajilopygame:
                 self.color = color
 
         def kill(self):
-            self.__del__()
\ No newline at end of file
+            self.__del__()
+
+    # a size-bounded cache that throws away the least recently used items
+    class lrucache:
+        def __init__(self, max_size=256):
+            self.max_size = max_size
+            self.items = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+        def get(self, key):
+            item = self.items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.items.move_to_end(key)
+            return item
+
+        def put(self, key, item):
+            self.items[key] = item
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+        def resize(self, max_size):
+            self.max_size = max_size
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+        def clear(self):
+            self.items.clear()
+
+        def stats(self):
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.items), "max_size": self.max_size}
+
+        def __len__(self):
+            return len(self.items)
+
+    # sound effects decoded once and played through a fixed pool of channels
+    class soundbank:
+        def __init__(self, channels=8, now=time.perf_counter):
+            self.now = now
+            self.channel_count = channels
+            self.channels = None    # created when the first effect plays
+            self.effects = {}
+            self.played = 0
+            self.dropped = 0
+
+        def load(self, name, sound, volume=0.5, max_voices=2, min_interval=0.05):
+            sound.set_volume(volume)
+            self.effects[name] = {"sound": sound, "max_voices": max_voices, "min_interval": min_interval,
+                                  "last_played": None, "played": 0, "dropped": 0}
+
+        def reserve_channels(self):
+            # the pool gets the first channels, the rest stay free for the background sound
+            pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), self.channel_count + 8))
+            pygame.mixer.set_reserved(self.channel_count)
+            self.channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+
+        def play(self, name):
+            effect = self.effects.get(name)
+            if effect is None:
+                return False
+            if self.channels is None:
+                self.reserve_channels()
+            now = self.now()
+            if effect["last_played"] is not None and now - effect["last_played"] < effect["min_interval"]:
+                return self.drop(effect)
+            free_channel = None
+            voices = 0
+            for channel in self.channels:
+                if channel.get_busy():
+                    if channel.get_sound() is effect["sound"]:
+                        voices += 1
+                elif free_channel is None:
+                    free_channel = channel
+            if voices >= effect["max_voices"] or free_channel is None:
+                return self.drop(effect)
+            free_channel.play(effect["sound"])
+            effect["last_played"] = now
+            effect["played"] += 1
+            self.played += 1
+            return True
+
+        def drop(self, effect):
+            effect["dropped"] += 1
+            self.dropped += 1
+            return False
+
+        def stats(self):
+            effects = {name: {"played": effect["played"], "dropped": effect["dropped"]} for name, effect in self.effects.items()}
+            return {"played": self.played, "dropped": self.dropped, "effects": effects}
+
+    # positions, velocities, sizes and flags of entities kept in numpy arrays
+    # so that a whole tag can be moved, bounded and bounced in one go
+    class entitystore:
+        EDGE_NONE, EDGE_LEFT, EDGE_RIGHT, EDGE_TOP, EDGE_BOTTOM = range(5)
+        EDGE_NAMES = (None, "left", "right", "top", "bottom")
+        EDGE_NAME_ARRAY = np.array(EDGE_NAMES, dtype=object)
+
+        def __init__(self, capacity=64):
+            self.capacity = 0
+            self.count = 0
+            self.x = np.zeros(0)
+            self.y = np.zeros(0)
+            self.vx = np.zeros(0)
+            self.vy = np.zeros(0)
+            self.width = np.zeros(0, dtype=np.int32)
+            self.height = np.zeros(0, dtype=np.int32)
+            self.edge = np.zeros(0, dtype=np.int8)
+            self.alive = np.zeros(0, dtype=bool)
+            self.visible = np.zeros(0, dtype=bool)
+            self.images = []
+            self.tag_of = []
+            self.tags = {}          # tag -> ids
+            self.tag_arrays = {}    # tag -> ids as an array, rebuilt when the tag changes
+            self.free_ids = []
+            self.moving = False
+            self.previous_x = self.previous_y = None
+            self.current_x = self.current_y = None
+            self.rng = np.random.default_rng()
+            self.grow(capacity)
+
+        def grow(self, capacity):
+            extra = capacity - self.capacity
+            for field in ("x", "y", "vx", "vy", "width", "height", "edge", "alive", "visible"):
+                array = getattr(self, field)
+                setattr(self, field, np.concatenate((array, np.zeros(extra, dtype=array.dtype))))
+            self.images.extend([None] * extra)
+            self.tag_of.extend([None] * extra)
+            self.capacity = capacity
+
+        def spawn(self, tag="entity", org=(0, 0), size=(0, 0), image=None):
+            if self.free_ids:
+                id = self.free_ids.pop()
+            else:
+                if self.count == self.capacity:
+                    self.grow(self.capacity * 2)
+                id = self.count
+                self.count += 1
+            self.x[id], self.y[id] = org
+            self.width[id], self.height[id] = size
+            self.vx[id] = self.vy[id] = 0
+            self.edge[id] = self.EDGE_NONE
+            self.alive[id] = self.visible[id] = True
+            self.images[id] = image
+            self.tag_of[id] = tag
+            self.tags.setdefault(tag, []).append(id)
+            self.tag_arrays.pop(tag, None)
+            return id
+
+        def kill(self, id):
+            if not self.alive[id]:
+                return
+            self.alive[id] = self.visible[id] = False
+            self.vx[id] = self.vy[id] = 0
+            self.images[id] = None
+            tag = self.tag_of[id]
+            self.tags[tag].remove(id)
+            self.tag_arrays.pop(tag, None)
+            self.free_ids.append(id)
+
+        def ids(self, tag):
+            ids = self.tag_arrays.get(tag)
+            if ids is None:
+                ids = np.array(self.tags.get(tag, ()), dtype=np.intp)
+                self.tag_arrays[tag] = ids
+            return ids
+
+        # a single field of an entity as a plain python value
+        def value(self, id, field):
+            if field == "edge":
+                return self.EDGE_NAMES[self.edge[id]]
+            value = getattr(self, field)[id].item()
+            if isinstance(value, float) and value.is_integer():
+                return int(value)
+            return value
+
+        def set_value(self, id, field, value):
+            if field == "edge":
+                value = self.EDGE_NAMES.index(value)
+            getattr(self, field)[id] = value
+
+        def integrate(self, time_scale=1):
+            n = self.count
+            self.x[:n] += self.vx[:n] * time_scale
+            self.y[:n] += self.vy[:n] * time_scale
+
+        # remembering the positions before a simulation step
+        def save_previous(self):
+            n = self.count
+            self.previous_x = self.x[:n].copy()
+            self.previous_y = self.y[:n].copy()
+
+        # moving the entities alpha of the way from their previous to their current positions for drawing
+        def interpolate(self, alpha):
+            if self.previous_x is None:
+                return      # no step has been taken yet
+            n = len(self.previous_x)
+            self.current_x = self.x[:n].copy()
+            self.current_y = self.y[:n].copy()
+            self.x[:n] = self.previous_x + (self.current_x - self.previous_x) * alpha
+            self.y[:n] = self.previous_y + (self.current_y - self.previous_y) * alpha
+
+        # putting the entities back after drawing
+        def restore(self):
+            if self.current_x is None:
+                return
+            n = len(self.current_x)
+            self.x[:n] = self.current_x
+            self.y[:n] = self.current_y
+            self.current_x = self.current_y = None
+
+        def bound(self, ids, wwidth, wheight):
+            self.x[ids] = np.clip(self.x[ids], 0, wwidth - self.width[ids])
+            self.y[ids] = np.clip(self.y[ids], 0, wheight - self.height[ids])
+
+        # remembering the last window edge each entity touched
+        def detect_edge(self, ids, wwidth, wheight):
+            x, y = self.x[ids], self.y[ids]
+            edges = self.edge[ids]
+            edges = np.where(x == 0, self.EDGE_LEFT, edges)
+            edges = np.where(x == wwidth - self.width[ids], self.EDGE_RIGHT, edges)
+            edges = np.where(y == 0, self.EDGE_TOP, edges)
+            edges = np.where(y == wheight - self.height[ids], self.EDGE_BOTTOM, edges)
+            self.edge[ids] = edges
+            return edges
+
+        # (image, position) pairs of the visible entities that have an image
+        # offset: added to every position, e.g. to move them by the camera
+        def blit_sequence(self, tag=None, offset=(0, 0)):
+            ids = np.flatnonzero(self.visible[:self.count]) if tag is None else self.ids(tag)
+            images = self.images
+            return [(images[id], (x, y)) for id, x, y in zip(ids.tolist(), (self.x[ids] + offset[0]).tolist(), (self.y[ids] + offset[1]).tolist())
+                    if images[id] is not None]
+
+    # finding colliding characters with a uniform grid (spatial hash)
+    # only characters that share a grid cell are tested against each other
+    class collisionworld:
+        ALL_LAYERS = 0xFFFFFFFF
+
+        def __init__(self, parent, cell_size=64, pixel_perfect=False):
+            self.parent = parent
+            self.cell_size = cell_size
+            self.pixel_perfect = pixel_perfect
+            self.bodies = {}            # character -> [order, layer, mask]
+            self.next_order = 0
+            self.contacts = set()
+            self.candidate_pairs = []
+            self.pairs = []
+            self.enter_callbacks = []
+            self.stay_callbacks = []
+            self.exit_callbacks = []
+
+        # layer: the layers the character is on
+        # mask: the layers the character collides with
+        def add(self, obj, layer=1, mask=ALL_LAYERS):
+            if obj not in self.bodies:
+                self.bodies[obj] = [self.next_order, layer, mask]
+                self.next_order += 1
+            else:
+                self.bodies[obj][1:] = [layer, mask]
+
+        def remove(self, obj):
+            self.bodies.pop(obj, None)
+
+        # callbacks are called as callback(character1, character2)
+        def on_enter(self, callback):
+            self.enter_callbacks.append(callback)
+
+        def on_stay(self, callback):
+            self.stay_callbacks.append(callback)
+
+        def on_exit(self, callback):
+            self.exit_callbacks.append(callback)
+
+        def update(self):
+            cell_size = self.cell_size
+            grid = {}
+            bodies = []
+            for obj, (order, layer, mask) in sorted(self.bodies.items(), key=lambda item: item[1][0]):
+                if not getattr(obj, "alive", True):
+                    continue
+                rect = obj.get_rect()
+                index = len(bodies)
+                bodies.append((obj, rect, layer, mask))
+                for cx in range(rect.left // cell_size, (rect.right - 1) // cell_size + 1):
+                    for cy in range(rect.top // cell_size, (rect.bottom - 1) // cell_size + 1):
+                        cell = grid.get((cx, cy))
+                        if cell is None:
+                            grid[(cx, cy)] = [index]
+                        else:
+                            cell.append(index)
+
+            candidates = set()
+            for cell in grid.values():
+                if len(cell) > 1:
+                    for i in range(len(cell) - 1):
+                        for j in range(i + 1, len(cell)):
+                            candidates.add((cell[i], cell[j]))
+
+            self.candidate_pairs = []
+            self.pairs = []
+            contacts = set()
+            for i, j in sorted(candidates):
+                obj1, rect1, layer1, mask1 = bodies[i]
+                obj2, rect2, layer2, mask2 = bodies[j]
+                if not (layer1 & mask2 and layer2 & mask1):
+                    continue
+                self.candidate_pairs.append((obj1, obj2))
+                if rect1.colliderect(rect2) and (not self.pixel_perfect or self.parent.detect_pixel_collision(obj1, obj2)):
+                    self.pairs.append((obj1, obj2))
+                    contacts.add((obj1, obj2))
+
+            for obj1, obj2 in self.pairs:
+                callbacks = self.stay_callbacks if (obj1, obj2) in self.contacts else self.enter_callbacks
+                for callback in callbacks:
+                    callback(obj1, obj2)
+            for obj1, obj2 in self.contacts - contacts:
+                for callback in self.exit_callbacks:
+                    callback(obj1, obj2)
+            self.contacts = contacts
+            return self.pairs
+
+        # the characters colliding with a character
+        def collisions_of(self, obj):
+            return [obj2 if obj1 is obj else obj1 for obj1, obj2 in self.pairs if obj in (obj1, obj2)]
+
+    # the places a type of entity can be moved to at random, kept as a grid of cells
+    # every cell counts what blocks it (an avoided entity or a limit band), a cell with no blocks is free
+    # and any position in it is allowed; the free cells are kept in a list, so picking one never needs a retry
+    class freespace:
+        def __init__(self, parent, type, avoid=(), radius=0, cell_size=16):
+            self.parent = parent
+            self.type = type
+            self.avoid = list(avoid)
+            self.radius = radius
+            self.cell_size = cell_size
+            self.xlimit = self.ylimit = (0, 0)
+            self.limits = []            # (axis, lower, upper) bands no position may be in
+            self.size = None
+            self.update()
+
+        # a new grid for entities of this size, the positions go from 0 to the window size minus the entity size
+        def build(self, size):
+            self.size = size
+            cell_size = self.cell_size
+            self.xmax = max(0, self.parent.wwidth - size[0])
+            self.ymax = max(0, self.parent.wheight - size[1])
+            self.columns = self.xmax // cell_size + 1
+            self.rows = self.ymax // cell_size + 1
+            self.blocked = np.zeros((self.rows, self.columns), dtype=np.int32)
+            self.free = list(range(self.rows * self.columns))     # the free cells first, then the blocked ones
+            self.slot = list(range(self.rows * self.columns))     # cell -> place in self.free
+            self.free_count = len(self.free)
+            self.ids = np.zeros(0, dtype=np.intp)
+            self.areas = np.zeros((0, 4), dtype=np.int64)
+            self.index = {}
+            for axis, lower, upper in self.limits:
+                self.change(self.limit_area(axis, lower, upper), 1)
+
+        # xlimit and ylimit: the bands of positions to leave out, (0, 0) for none
+        # calling it again with the same bands (e.g. on every frame) leaves the grid as it is
+        def set_limits(self, xlimit, ylimit):
+            limits = [(axis, min(limit), max(limit)) for axis, limit in ((0, xlimit), (1, ylimit)) if tuple(limit) != (0, 0)]
+            if limits == self.limits:
+                return
+            for axis, lower, upper in self.limits:
+                self.change(self.limit_area(axis, lower, upper), -1)
+            self.xlimit, self.ylimit = xlimit, ylimit
+            self.limits = limits
+            for axis, lower, upper in self.limits:
+                self.change(self.limit_area(axis, lower, upper), 1)
+
+        def in_limits(self, xpos, ypos):
+            return any(np.any((lower <= (xpos, ypos)[axis]) & ((xpos, ypos)[axis] <= upper)) for axis, lower, upper in self.limits)
+
+        def limit_area(self, axis, lower, upper):
+            cells = (max(0, int(lower) // self.cell_size), max(0, int(upper) // self.cell_size + 1))
+            return cells + (0, self.columns) if axis == 1 else (0, self.rows) + cells
+
+        # the cells (row0, row1, column0, column1) where the entity would come closer than radius to the avoided ones
+        def areas_of(self, ids):
+            entities = self.parent.entities
+            cell_size = self.cell_size
+            reach = self.radius
+            x = entities.x[ids]
+            y = entities.y[ids]
+            areas = np.empty((len(ids), 4), dtype=np.int64)
+            areas[:, 0] = np.floor((y - reach - self.size[1] + 1) / cell_size)
+            areas[:, 1] = np.floor((y + entities.height[ids] + reach - 1) / cell_size) + 1
+            areas[:, 2] = np.floor((x - reach - self.size[0] + 1) / cell_size)
+            areas[:, 3] = np.floor((x + entities.width[ids] + reach - 1) / cell_size) + 1
+            np.clip(areas[:, :2], 0, self.rows, out=areas[:, :2])
+            np.clip(areas[:, 2:], 0, self.columns, out=areas[:, 2:])
+            return areas
+
+        # adding amount to the blocks of an area, the cells that become free or blocked are moved in the free list
+        def change(self, area, amount):
+            row0, row1, column0, column1 = area
+            cells = self.blocked[row0:row1, column0:column1]
+            if cells.size == 0:
+                return
+            cells += amount
+            for row, column in np.argwhere(cells == (1 if amount > 0 else 0)):
+                cell = (row0 + row) * self.columns + column0 + column
+                if amount > 0:
+                    self.swap(cell, self.free_count - 1)
+                    self.free_count -= 1
+                else:
+                    self.swap(cell, self.free_count)
+                    self.free_count += 1
+
+        def swap(self, cell, slot):
+            other = self.free[slot]
+            self.free[self.slot[cell]] = other
+            self.slot[other] = self.slot[cell]
+            self.free[slot] = cell
+            self.slot[cell] = slot
+
+        # following the avoided entities, only the ones that moved to other cells change the grid
+        def update(self):
+            parent = self.parent
+            entities = parent.entities
+            placed = np.atleast_1d(parent.entity_ids(self.type))
+            size = (int(entities.width[placed].max(initial=0)), int(entities.height[placed].max(initial=0)))
+            if size != self.size:
+                self.build(size)
+            ids = np.concatenate([np.atleast_1d(parent.entity_ids(type)) for type in self.avoid] or [self.ids]).astype(np.intp)
+            ids = ids[entities.alive[ids]]
+            areas = self.areas_of(ids)
+            if np.array_equal(ids, self.ids):
+                for index in np.flatnonzero((areas != self.areas).any(axis=1)):
+                    self.change(areas[index], 1)        # blocking first, so the cells both areas share stay blocked
+                    self.change(self.areas[index], -1)
+            else:
+                for area in areas:
+                    self.change(area, 1)
+                for area in self.areas:
+                    self.change(area, -1)
+                self.ids = ids
+                self.index = {id: index for index, id in enumerate(ids.tolist())}
+            self.areas = areas
+
+        # an entity was just moved, if it is avoided its cells change now instead of on the next frame
+        def moved(self, id):
+            index = self.index.get(id)
+            if index is not None:
+                area = self.areas_of(self.ids[index:index + 1])[0]
+                self.change(area, 1)
+                self.change(self.areas[index], -1)
+                self.areas[index] = area
+
+        # a random allowed position, or None when there is no free cell left
+        def sample(self):
+            if self.free_count == 0:
+                return None
+            cell_size = self.cell_size
+            cell = self.free[int(self.parent.entities.rng.integers(self.free_count))]
+            row, column = divmod(cell, self.columns)
+            xpos, ypos = column * cell_size, row * cell_size
+            xoffset, yoffset = self.parent.entities.rng.integers((min(cell_size, self.xmax - xpos + 1), min(cell_size, self.ymax - ypos + 1)))
+            return xpos + int(xoffset), ypos + int(yoffset)
+
+    # a clock that counts frames instead of waiting for them, used in headless mode
+    # time is in milliseconds like pygame.time.Clock
+    class virtualclock:
+        def __init__(self):
+            self.time = 0
+            self.frame_time = 0
+            self.frames = 0
+
+        def tick(self, framerate=0):
+            self.frame_time = 1000 / framerate if framerate else 0
+            self.time += self.frame_time
+            self.frames += 1
+            return int(self.frame_time)
+
+        def get_time(self):
+            return int(self.frame_time)
+
+        def get_rawtime(self):
+            return int(self.frame_time)
+
+        def get_fps(self):
+            return 1000 / self.frame_time if self.frame_time else 0
+
+    # times the phases of every frame and keeps the last few frames
+    class frameprofiler:
+        PHASES = ("user", "overlay", "present", "events", "timers", "animations", "input", "entities", "physics", "collisions", "trigger", "effects", "lives", "tick")
+        COLORS = ((80, 160, 255), (120, 120, 120), (255, 200, 0), (200, 80, 255), (255, 255, 120), (160, 255, 200), (0, 220, 120), (0, 160, 160), (120, 200, 255),
+                  (255, 80, 80), (255, 140, 0), (255, 120, 200), (180, 180, 60), (60, 60, 60))
+        MS_PER_PIXEL = 0.5
+
+        def __init__(self, window=240, overlay=True):
+            self.samples = deque(maxlen=window)
+            self.overlay = overlay
+            self.frames = 0
+            self.label = None
+            self.current = dict.fromkeys(self.PHASES, 0.0)
+            self.last = None
+            self.bars = None
+
+        # the time since the last mark is added to a phase
+        def mark(self, phase):
+            now = time.perf_counter()
+            if self.last is not None:
+                self.current[phase] += (now - self.last) * 1000
+            self.last = now
+
+        def end_frame(self):
+            sample = tuple(self.current[phase] for phase in self.PHASES)
+            self.samples.append(sample)
+            self.frames += 1
+            for phase in self.PHASES:
+                self.current[phase] = 0.0
+            if self.bars is not None:
+                self.add_bar(sample)
+
+        def summary(self):
+            count = len(self.samples) or 1
+            summary = {phase: sum(sample[i] for sample in self.samples) / count for i, phase in enumerate(self.PHASES)}
+            summary["total"] = sum(summary.values())
+            return summary
+
+        # one column per frame, stacked by phase; scrolled instead of redrawn
+        def overlay_surface(self):
+            if self.bars is None:
+                self.bars = pygame.Surface((self.samples.maxlen, 80)).convert()
+                self.bars.fill((0, 0, 0))
+                for sample in self.samples:
+                    self.add_bar(sample)
+            return self.bars
+
+        def add_bar(self, sample):
+            bars = self.bars
+            height = bars.get_height()
+            bars.scroll(-1, 0)
+            x = bars.get_width() - 1
+            bars.fill((0, 0, 0), (x, 0, 1, height))
+            bottom = height
+            for value, color in zip(sample, self.COLORS):
+                pixels = int(value / self.MS_PER_PIXEL)
+                if pixels:
+                    bars.fill(color, (x, bottom - pixels, 1, pixels))
+                    bottom -= pixels
+            # a line at 60 fps
+            bars.set_at((x, height - int(1000 / 60 / self.MS_PER_PIXEL)), (255, 255, 255))
+
+        def export_csv(self, file_path):
+            with open(file_path, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(("frame",) + self.PHASES)
+                first = self.frames - len(self.samples)
+                for i, sample in enumerate(self.samples):
+                    writer.writerow((first + i,) + tuple(round(value, 4) for value in sample))
+
+        def export_json(self, file_path):
+            first = self.frames - len(self.samples)
+            with open(file_path, "w") as file:
+                json.dump({"phases": self.PHASES, "first_frame": first, "samples_ms": list(self.samples),
+                           "summary_ms": self.summary()}, file, indent=1)
+
+    # a timer from after(), every() or a waiting script
+    class timer:
+        def __init__(self, function, args, expires, interval=None):
+            self.function = function
+            self.args = args
+            self.expires = expires      # in ticks of the timer wheel
+            self.interval = interval
+            self.cancelled = False
+
+        def cancel(self):
+            self.cancelled = True
+
+    # a hierarchical timer wheel: adding, cancelling and advancing by a tick
+    # are O(1) however many timers there are
+    # LEVELS wheels of SLOTS slots, a timer is kept in the wheel its distance fits in
+    # and moved down a wheel (cascaded) when the lower wheel comes around to it
+    class timerwheel:
+        BITS = 6
+        SLOTS = 1 << BITS
+        MASK = SLOTS - 1
+        LEVELS = 4
+
+        def __init__(self, resolution=0.01, start=0):
+            self.resolution = resolution    # seconds per tick
+            self.start = start
+            self.current = 0
+            self.pending = 0
+            self.wheels = [[[] for slot in range(self.SLOTS)] for level in range(self.LEVELS)]
+
+        def after(self, seconds, function, *args):
+            return self.add(sajilopygame.timer(function, args, self.current + self.ticks(seconds)))
+
+        def every(self, seconds, function, *args):
+            interval = self.ticks(seconds)
+            return self.add(sajilopygame.timer(function, args, self.current + interval, interval))
+
+        def ticks(self, seconds):
+            return max(1, int(round(seconds / self.resolution)))
+
+        def add(self, timer):
+            self.place(timer)
+            self.pending += 1
+            return timer
+
+        def place(self, timer):
+            delta = timer.expires - self.current
+            for level in range(self.LEVELS):
+                if delta < self.SLOTS << (self.BITS * level) or level == self.LEVELS - 1:
+                    slot = (timer.expires >> (self.BITS * level)) & self.MASK
+                    self.wheels[level][slot].append(timer)
+                    return
+
+        # moving the wheel forward to the time now (in seconds) and calling the due timers
+        def update(self, now):
+            target = int((now - self.start) / self.resolution + 1e-6)
+            if self.pending == 0:
+                self.current = max(self.current, target)
+                return
+            while self.current < target and self.pending:
+                self.current += 1
+                self.cascade()
+                slot = self.wheels[0][self.current & self.MASK]
+                if slot:
+                    self.wheels[0][self.current & self.MASK] = []
+                    for timer in slot:
+                        self.fire(timer)
+            self.current = max(self.current, target)
+
+        # when a lower wheel wraps around, the next slot of the wheel above is spread into it
+        def cascade(self):
+            top = 0
+            while top < self.LEVELS - 1 and self.current & ((1 << (self.BITS * (top + 1))) - 1) == 0:
+                top += 1
+            for level in range(top, 0, -1):
+                slot = (self.current >> (self.BITS * level)) & self.MASK
+                timers = self.wheels[level][slot]
+                if timers:
+                    self.wheels[level][slot] = []
+                    for timer in timers:
+                        self.place(timer)
+
+        def fire(self, timer):
+            self.pending -= 1
+            if timer.cancelled:
+                return
+            if timer.interval is not None:
+                timer.expires += timer.interval
+                self.add(timer)
+            timer.function(*timer.args)
+
+        # a generator that yields the seconds it wants to wait
+        def start_script(self, script):
+            handle = sajilopygame.timer(None, (), self.current)
+            handle.function = lambda: self.step_script(script, handle)
+            handle.function()
+            return handle
+
+        def step_script(self, script, handle):
+            if handle.cancelled:
+                return
+            try:
+                seconds = next(script)
+            except StopIteration:
+                return
+            handle.expires = self.current + (self.ticks(seconds) if seconds else 1)
+            self.add(handle)
+
+    # a fixed number of projectiles kept in numpy arrays
+    # firing takes a slot from the free list and leaving the window puts it back,
+    # so nothing is created per shot
+    class projectilepool:
+        def __init__(self, image, capacity=64):
+            self.image = image
+            self.width, self.height = image.get_size()
+            self.capacity = capacity
+            self.x = np.zeros(capacity)
+            self.y = np.zeros(capacity)
+            self.vx = np.zeros(capacity)
+            self.vy = np.zeros(capacity)
+            self.active = np.zeros(capacity, dtype=bool)
+            self.free = np.arange(capacity - 1, -1, -1)
+            self.free_count = capacity
+            self.step = np.zeros(capacity)
+            self.outside = np.zeros(capacity, dtype=bool)
+            self.check = np.zeros(capacity, dtype=bool)
+            self.fired = 0
+            self.dropped = 0
+
+        def active_count(self):
+            return self.capacity - self.free_count
+
+        def spawn(self, x, y, vx, vy):
+            if self.free_count == 0:
+                self.dropped += 1
+                return False
+            self.free_count -= 1
+            i = self.free[self.free_count]
+            self.x[i], self.y[i], self.vx[i], self.vy[i] = x, y, vx, vy
+            self.active[i] = True
+            self.fired += 1
+            return True
+
+        def recycle(self, i):
+            if self.active[i]:
+                self.active[i] = False
+                self.free[self.free_count] = i
+                self.free_count += 1
+
+        # moving every projectile and recycling the ones that left the window
+        def advance(self, time_scale, wwidth, wheight):
+            if self.free_count == self.capacity:
+                return
+            np.multiply(self.vx, time_scale, out=self.step)
+            np.add(self.x, self.step, out=self.x)
+            np.multiply(self.vy, time_scale, out=self.step)
+            np.add(self.y, self.step, out=self.y)
+            outside, check = self.outside, self.check
+            np.less(self.x, -self.width, out=outside)
+            np.greater(self.x, wwidth, out=check)
+            np.logical_or(outside, check, out=outside)
+            np.less(self.y, -self.height, out=check)
+            np.logical_or(outside, check, out=outside)
+            np.greater(self.y, wheight, out=check)
+            np.logical_or(outside, check, out=outside)
+            np.logical_and(outside, self.active, out=outside)
+            if outside.any():
+                for i in np.flatnonzero(outside).tolist():
+                    self.recycle(i)
+
+        # recycling the projectiles that overlap a rectangle, returns how many did
+        def hit(self, rect):
+            if self.free_count == self.capacity:
+                return 0
+            hits = (self.active & (self.x < rect.right) & (self.x + self.width > rect.left)
+                    & (self.y < rect.bottom) & (self.y + self.height > rect.top))
+            ids = np.flatnonzero(hits).tolist()
+            for i in ids:
+                self.recycle(i)
+            return len(ids)
+
+        def blit_sequence(self, offset=(0, 0)):
+            ids = np.flatnonzero(self.active)
+            image = self.image
+            return [(image, (x, y)) for x, y in zip((self.x[ids] + offset[0]).tolist(), (self.y[ids] + offset[1]).tolist())]
+
+    # particles kept in numpy arrays, all of them are moved with a few array operations
+    # living particles are packed at the start of the arrays
+    class particlesystem:
+        def __init__(self, capacity=10000, gravity=0, mode="point"):
+            self.capacity = capacity
+            self.gravity = gravity
+            self.mode = mode
+            self.count = 0
+            self.x = np.zeros(capacity)
+            self.y = np.zeros(capacity)
+            self.vx = np.zeros(capacity)
+            self.vy = np.zeros(capacity)
+            self.life = np.zeros(capacity)
+            self.max_life = np.ones(capacity)
+            self.color = np.zeros((capacity, 3), dtype=np.uint8)
+            self.size = np.ones(capacity, dtype=np.int32)
+            self.sprites = {}
+            self.dropped = 0
+            self.rng = np.random.default_rng()
+
+        # angle in degrees, 90 is up; spread: how wide (in degrees) around the angle they fly
+        def emit(self, xpos, ypos, count=50, speed=3, angle=90, spread=360, life=60, color=(255, 255, 255), size=1, color_jitter=0):
+            n = min(count, self.capacity - self.count)
+            self.dropped += count - n
+            if n <= 0:
+                return
+            rng = self.rng
+            new = slice(self.count, self.count + n)
+            angles = np.radians(angle + (rng.random(n) - 0.5) * spread)
+            speeds = speed * (0.3 + 0.7 * rng.random(n))
+            self.x[new] = xpos
+            self.y[new] = ypos
+            self.vx[new] = np.cos(angles) * speeds
+            self.vy[new] = -np.sin(angles) * speeds
+            self.life[new] = life * (0.6 + 0.4 * rng.random(n))
+            self.max_life[new] = self.life[new]
+            if color_jitter:
+                jitter = rng.integers(-color_jitter, color_jitter + 1, size=(n, 3))
+                self.color[new] = np.clip(np.array(color) + jitter, 0, 255)
+            else:
+                self.color[new] = color
+            self.size[new] = size
+            self.count += n
+
+        def update(self, time_scale=1):
+            n = self.count
+            if n == 0:
+                return
+            self.vy[:n] += self.gravity * time_scale
+            self.x[:n] += self.vx[:n] * time_scale
+            self.y[:n] += self.vy[:n] * time_scale
+            self.life[:n] -= time_scale
+            alive = self.life[:n] > 0
+            living = int(np.count_nonzero(alive))
+            if living < n:
+                for array in (self.x, self.y, self.vx, self.vy, self.life, self.max_life, self.color, self.size):
+                    array[:living] = array[:n][alive]
+                self.count = living
+
+        # drawing the particles, returns the rectangle they cover
+        def draw(self, surface, offset=(0, 0)):
+            n = self.count
+            if n == 0:
+                return None
+            width, height = surface.get_size()
+            x = (self.x[:n] + offset[0]).astype(np.int32)
+            y = (self.y[:n] + offset[1]).astype(np.int32)
+            if self.mode == "point":
+                inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+                x, y = x[inside], y[inside]
+                if len(x) == 0:
+                    return None
+                # fading out as they die
+                fade = (self.life[:n][inside] / self.max_life[:n][inside])[:, None]
+                pixels = pygame.surfarray.pixels3d(surface)
+                pixels[x, y] = (self.color[:n][inside] * fade).astype(np.uint8)
+                del pixels      # unlocking the surface
+                left, top = int(x.min()), int(y.min())
+                return pygame.Rect(left, top, int(x.max()) - left + 1, int(y.max()) - top + 1)
+            # sprite mode: one cached circle per (size, color), colors rounded to 8 shades per channel
+            sprites = self.sprites
+            sequence = []
+            half = self.size[:n] // 2
+            colors = (self.color[:n] & 0xE0) | 0x10
+            for px, py, size, r, g, b in zip((x - half).tolist(), (y - half).tolist(), self.size[:n].tolist(),
+                                             *colors.T.tolist()):
+                key = (size, r, g, b)
+                sprite = sprites.get(key)
+                if sprite is None:
+                    sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+                    pygame.draw.circle(sprite, (r, g, b), (size / 2, size / 2), size / 2)
+                    sprites[key] = sprite
+                sequence.append((sprite, (px, py)))
+            surface.blits(sequence, False)
+            left, top = int((x - half).min()), int((y - half).min())
+            return pygame.Rect(left, top, int(x.max()) - left + int(self.size[:n].max()), int(y.max()) - top + int(self.size[:n].max()))
+
+    # the part of the world that is shown on the window
+    # positions stay world positions, the camera only moves them when drawing
+    class gamecamera:
+        def __init__(self, width, height, org=(0, 0), bounds=None):
+            self.width = width
+            self.height = height
+            self.x, self.y = org
+            self.bounds = bounds
+            self.clamp()
+
+        def rect(self):
+            xpos, ypos = self.offset()
+            return pygame.Rect(-xpos, -ypos, self.width, self.height)
+
+        # the camera moves in whole pixels so that tiles do not shimmer
+        def offset(self):
+            return -round(self.x), -round(self.y)
+
+        def to_screen(self, xpos, ypos):
+            ox, oy = self.offset()
+            return xpos + ox, ypos + oy
+
+        def to_world(self, xpos, ypos):
+            ox, oy = self.offset()
+            return xpos - ox, ypos - oy
+
+        def move(self, dx=0, dy=0):
+            self.x += dx
+            self.y += dy
+            self.clamp()
+
+        def move_to(self, xpos, ypos):
+            self.x, self.y = xpos, ypos
+            self.clamp()
+
+        def follow(self, rect, smoothing=1):
+            self.x += (rect.centerx - self.width / 2 - self.x) * smoothing
+            self.y += (rect.centery - self.height / 2 - self.y) * smoothing
+            self.clamp()
+
+        def clamp(self):
+            if self.bounds is None:
+                return
+            world_width, world_height = self.bounds
+            self.x = max(0, min(self.x, world_width - self.width))
+            self.y = max(0, min(self.y, world_height - self.height))
+
+    # a grid of tiles drawn from pre-rendered chunks
+    # a chunk is only rendered again when one of its tiles changes
+    class tilemap:
+        def __init__(self, grid, images, tile_size=32, chunk_size=256):
+            self.grid = [list(row) for row in grid]
+            self.images = images
+            self.tile_size = tile_size
+            self.chunk_tiles = max(1, chunk_size // tile_size)    # tiles along one side of a chunk
+            self.rows = len(self.grid)
+            self.columns = max((len(row) for row in self.grid), default=0)
+            self.width = self.columns * tile_size
+            self.height = self.rows * tile_size
+            self.chunks = {}
+            self.changed_chunks = set()
+            self.rebuilds = 0
+
+        def size(self):
+            return self.width, self.height
+
+        def get_tile(self, column, row):
+            if 0 <= row < self.rows and 0 <= column < len(self.grid[row]):
+                return self.grid[row][column]
+            return None
+
+        def set_tile(self, column, row, value):
+            if not (0 <= row < self.rows and 0 <= column < len(self.grid[row])):
+                return
+            if self.grid[row][column] != value:
+                self.grid[row][column] = value
+                self.changed_chunks.add((column // self.chunk_tiles, row // self.chunk_tiles))
+
+        # the tile under a world position
+        def tile_at(self, xpos, ypos):
+            return self.get_tile(int(xpos // self.tile_size), int(ypos // self.tile_size))
+
+        # the (column, row) of the tile under a world position
+        def tile_position(self, xpos, ypos):
+            return int(xpos // self.tile_size), int(ypos // self.tile_size)
+
+        def build_chunk(self, cx, cy):
+            n, tile_size = self.chunk_tiles, self.tile_size
+            chunk = pygame.Surface((n * tile_size, n * tile_size), pygame.SRCALPHA)
+            sequence = []
+            images = self.images
+            for row in range(cy * n, min(self.rows, (cy + 1) * n)):
+                cells = self.grid[row]
+                for column in range(cx * n, min(len(cells), (cx + 1) * n)):
+                    image = images.get(cells[column])
+                    if image is not None:
+                        sequence.append((image, ((column - cx * n) * tile_size, (row - cy * n) * tile_size)))
+            chunk.blits(sequence, False)
+            self.rebuilds += 1
+            return chunk
+
+        # blitting the chunks that overlap the view, returns the rectangles drawn on the surface
+        def draw(self, surface, view):
+            chunk_pixels = self.chunk_tiles * self.tile_size
+            first_cx, first_cy = max(0, view.left // chunk_pixels), max(0, view.top // chunk_pixels)
+            last_cx = min((self.width - 1) // chunk_pixels, (view.right - 1) // chunk_pixels)
+            last_cy = min((self.height - 1) // chunk_pixels, (view.bottom - 1) // chunk_pixels)
+            sequence = []
+            for cy in range(first_cy, last_cy + 1):
+                for cx in range(first_cx, last_cx + 1):
+                    key = (cx, cy)
+                    chunk = self.chunks.get(key)
+                    if chunk is None or key in self.changed_chunks:
+                        chunk = self.chunks[key] = self.build_chunk(cx, cy)
+                        self.changed_chunks.discard(key)
+                    sequence.append((chunk, (cx * chunk_pixels - view.left, cy * chunk_pixels - view.top)))
+            return surface.blits(sequence)
+
+    # the clips of one entity or character and the one that is playing
+    # every clip is (frames, fps, mode); the frame is worked out from the time the clip has played
+    class spriteanimation:
+        def __init__(self):
+            self.clips = {}
+            self.clip = None
+            self.time = 0
+            self.index = 0
+            self.finished = False
+
+        def add(self, name, frames, fps=10, mode="loop"):
+            self.clips[name] = (frames, fps, mode)
+
+        def play(self, name, restart=False):
+            if name == self.clip and not restart:
+                return
+            self.clip = name
+            self.time = 0
+            self.index = 0
+            self.finished = False
+
+        # returns True when the frame changed
+        def update(self, elapsed):
+            if self.clip is None or self.finished:
+                return False
+            frames, fps, mode = self.clips[self.clip]
+            self.time += elapsed
+            count = len(frames)
+            position = int(self.time * fps)
+            if mode == "once":
+                if position >= count - 1:
+                    position = count - 1
+                    self.finished = True
+            elif mode == "pingpong" and count > 1:
+                position %= 2 * count - 2
+                if position >= count:
+                    position = 2 * count - 2 - position
+            else:
+                position %= count
+            if position == self.index:
+                return False
+            self.index = position
+            return True
+
+        def image(self):
+            return self.clips[self.clip][0][self.index]
+
+    # many images packed into a few big surfaces (pages), with the rectangle of every image
+    # drawing from the pages blits an area of a page, many of them in one blits call
+    class textureatlas:
+        INDEX_FILE = "atlas.json"
+
+        def __init__(self, pages, index):
+            self.pages = pages
+            self.index = index      # name: (page number, pygame.Rect)
+            self.images = {}
+
+        # shelf packing: the tallest images first, placed left to right in rows
+        @classmethod
+        def pack(cls, images, max_size=2048, padding=1):
+            pages, index = [], {}
+            shelves = []    # one (xpos, ypos, height) shelf being filled per page
+            for name in sorted(images, key=lambda name: (-images[name].get_height(), name)):
+                width, height = images[name].get_size()
+                if width + padding > max_size or height + padding > max_size:
+                    print("image too big for the atlas: " + name)
+                    continue
+                for page, (xpos, ypos, shelf_height) in enumerate(shelves):
+                    if xpos + width + padding > max_size:
+                        xpos, ypos, shelf_height = 0, ypos + shelf_height, 0
+                    if ypos + height + padding <= max_size:
+                        break
+                else:
+                    page = len(shelves)
+                    shelves.append((0, 0, 0))
+                    pages.append([])
+                    xpos, ypos, shelf_height = 0, 0, 0
+                index[name] = (page, pygame.Rect(xpos, ypos, width, height))
+                pages[page].append(name)
+                shelves[page] = (xpos + width + padding, ypos, max(shelf_height, height + padding))
+            surfaces = []
+            for page, names in enumerate(pages):
+                used_width = max(index[name][1].right for name in names)
+                used_height = max(index[name][1].bottom for name in names)
+                surface = pygame.Surface((used_width, used_height), pygame.SRCALPHA).convert_alpha()
+                surface.fill((0, 0, 0, 0))
+                surface.blits([(images[name], index[name][1]) for name in names], False)
+                surfaces.append(surface)
+            return cls(surfaces, index)
+
+        # the saved atlas, or None when it is missing or the images have changed
+        @classmethod
+        def load(cls, folder, signature):
+            index_path = os.path.join(folder, cls.INDEX_FILE)
+            if not os.path.exists(index_path):
+                return None
+            try:
+                with open(index_path, "r") as file:
+                    data = json.load(file)
+                if data.get("signature") != signature:
+                    return None
+                pages = []
+                for page, size in data["pages"]:
+                    with open(os.path.join(folder, page), "rb") as file:
+                        pages.append(pygame.image.frombytes(file.read(), tuple(size), "RGBA").convert_alpha())
+            except (OSError, ValueError, KeyError, pygame.error):
+                return None
+            index = {name: (page, pygame.Rect(rect)) for name, (page, rect) in data["index"].items()}
+            return cls(pages, index)
+
+        # the pages are saved as raw pixels, reading them back is faster than decoding a png
+        def save(self, folder, signature):
+            os.makedirs(folder, exist_ok=True)
+            page_files = []
+            for number, page in enumerate(self.pages):
+                page_files.append(["page_%d.rgba" % number, list(page.get_size())])
+                with open(os.path.join(folder, page_files[-1][0]), "wb") as file:
+                    file.write(pygame.image.tobytes(page, "RGBA"))
+            data = {"signature": signature, "pages": page_files,
+                    "index": {name: [page, list(rect)] for name, (page, rect) in self.index.items()}}
+            with open(os.path.join(folder, self.INDEX_FILE), "w") as file:
+                json.dump(data, file)
+
+        # one image of the atlas, a subsurface that shares the pixels of its page
+        def image(self, name):
+            image = self.images.get(name)
+            if image is None:
+                page, rect = self.index[name]
+                image = self.images[name] = self.pages[page].subsurface(rect)
+            return image
+
+        # (page, position, area) triples for Surface.blits
+        def blit_sequence(self, sprites, offset=(0, 0)):
+            index, pages = self.index, self.pages
+            ox, oy = offset
+            sequence = []
+            for name, (xpos, ypos) in sprites:
+                page, rect = index[name]
+                sequence.append((pages[page], (xpos + ox, ypos + oy), rect))
+            return sequence
+
+    # decoding files on a pool of threads, the main thread collects what is finished
+    # a path is only decoded once, asking for it again while it is loading does nothing
+    class assetloader:
+        def __init__(self, workers=4):
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+            self.pending = {}       # cache key (absolute path): (kind, future)
+            self.total = 0
+            self.loaded = 0
+            self.failed = []
+            self.reported = 0
+            self.progress_callbacks = []
+            self.complete_callbacks = []
+
+        @staticmethod
+        def decode(path, kind):
+            if kind == "image":
+                return pygame.image.load(path)
+            return pygame.mixer.Sound(path)
+
+        def submit(self, path, kind):
+            if path in self.pending:
+                return
+            self.pending[path] = (kind, self.executor.submit(self.decode, path, kind))
+            self.total += 1
+
+        # the (path, kind, asset) of every file that has finished
+        def collect(self):
+            finished = []
+            for path, (kind, future) in list(self.pending.items()):
+                if not future.done():
+                    continue
+                del self.pending[path]
+                self.loaded += 1
+                try:
+                    finished.append((path, kind, future.result()))
+                except (OSError, pygame.error) as error:
+                    print("could not load " + path + ": " + str(error))
+                    self.failed.append(path)
+            return finished
+
+        # calling the callbacks once for every change
+        def report(self):
+            if self.loaded != self.reported:
+                self.reported = self.loaded
+                for callback in self.progress_callbacks:
+                    callback(self.loaded, self.total)
+            if self.done():
+                for callback in self.complete_callbacks:
+                    callback()
+
+        def progress(self):
+            return self.loaded / self.total if self.total else 1.0
+
+        def done(self):
+            return not self.pending
+
+        def close(self):
+            self.executor.shutdown(wait=False)
+
+    # a box or circle moved by the physics world, and what it moves (an entity id or a character)
+    # x, y is the top left corner like the positions of the entities
+    class physicsbody:
+        __slots__ = ("target", "shape", "x", "y", "vx", "vy", "width", "height", "radius", "inv_mass", "restitution",
+                     "friction", "static", "sleeping", "rest_time", "anchor", "written")
+
+        def __init__(self, target, shape="box", mass=1, restitution=0.5, friction=0.2, static=False):
+            self.target = target
+            self.shape = shape
+            self.x = self.y = 0.0
+            self.vx = self.vy = 0.0
+            self.width = self.height = self.radius = 0
+            self.inv_mass = 0 if static or not mass else 1 / mass
+            self.restitution = restitution
+            self.friction = friction
+            self.static = static
+            self.sleeping = False
+            self.rest_time = 0      # how long it has stayed near its anchor
+            self.anchor = None
+            self.written = None     # the position last given to the target
+
+        def wake(self):
+            self.sleeping = False
+            self.rest_time = 0
+            self.anchor = None
+
+        def apply_impulse(self, ix, iy):
+            self.vx += ix * self.inv_mass
+            self.vy += iy * self.inv_mass
+            self.wake()
+
+        def center(self):
+            return self.x + self.width / 2, self.y + self.height / 2
+
+    # bodies moved with a fixed step: gravity, walls, collisions with impulses and the window boundary
+    # bodies that stop moving fall asleep and cost nothing until something hits or moves them
+    class physicsworld:
+        SLEEP_DISTANCE = 2      # pixels a resting body may wobble around its anchor
+        SLEEP_TIME = 0.5        # seconds near the anchor before falling asleep
+        WAKE_SPEED = 50         # pixels per second a body must hit a sleeping body with to wake it
+        WAKE_DEPTH = 8          # pixels of overlap that wake a sleeping body
+        SLOP = 0.5              # pixels of overlap left alone, stops resting bodies from jittering
+        CORRECTION = 0.8        # part of the overlap pushed out on every step
+        MAX_STEPS = 8
+        ITERATIONS = 4          # velocity passes over the contacts of a step
+
+        def __init__(self, parent, settings, gravity_strength=900, bounds=None, step=1/120):
+            self.parent = parent
+            self.gravity = settings.get("gravity", False)
+            self.wall = settings.get("wall", False)
+            self.collision = settings.get("collision", False)
+            self.boundary = settings.get("boundary", False)
+            self.gravity_strength = gravity_strength
+            self.bounds = bounds
+            self.step_time = step
+            self.accumulator = 0
+            self.bodies = []
+            self.walls = []
+            self.pairs_tested = 0
+
+        def add(self, body):
+            self.read(body, force=True)
+            self.bodies.append(body)
+
+        def add_wall(self, rect):
+            wall = self.parent.physicsbody(None, "box", static=True)
+            wall.x, wall.y, wall.width, wall.height = rect
+            self.walls.append(wall)
+            for body in self.bodies:
+                body.wake()
+            return wall
+
+        def remove(self, condition):
+            self.bodies = [body for body in self.bodies if not condition(body)]
+
+        # taking the position of the target, a target moved by the game wakes its body
+        def read(self, body, force=False):
+            target, parent = body.target, self.parent
+            if isinstance(target, parent.character):
+                xpos, ypos = target.xpos, target.ypos
+                width, height = target.get_rect().size
+            else:
+                entities = parent.entities
+                xpos, ypos = float(entities.x[target]), float(entities.y[target])
+                width, height = int(entities.width[target]), int(entities.height[target])
+            if force or (xpos, ypos) != body.written:
+                body.x, body.y = xpos, ypos
+                body.written = (xpos, ypos)
+                body.wake()
+            if (width, height) != (body.width, body.height):
+                body.width, body.height = width, height
+                body.radius = min(width, height) / 2
+
+        def write(self, body):
+            target = body.target
+            if isinstance(target, self.parent.character):
+                target.xpos, target.ypos = body.x, body.y
+            else:
+                entities = self.parent.entities
+                entities.x[target] = body.x
+                entities.y[target] = body.y
+            body.written = (body.x, body.y)
+
+        def alive(self, body):
+            target = body.target
+            if isinstance(target, self.parent.character):
+                return target.alive
+            return bool(self.parent.entities.alive[target])
+
+        def update(self, elapsed):
+            bodies = self.bodies
+            if any(not self.alive(body) for body in bodies):
+                self.remove(lambda body: not self.alive(body))
+                bodies = self.bodies
+            for body in bodies:
+                self.read(body)
+            if all(body.sleeping or body.static for body in bodies):
+                self.accumulator = 0
+                return      # nothing is moving
+            self.accumulator += elapsed
+            steps = 0
+            while self.accumulator >= self.step_time and steps < self.MAX_STEPS:
+                self.step(self.step_time)
+                self.accumulator -= self.step_time
+                steps += 1
+            if steps == self.MAX_STEPS:
+                self.accumulator = 0
+            for body in bodies:
+                if not body.static and (body.x, body.y) != body.written:
+                    self.write(body)
+
+        def step(self, dt):
+            gravity = self.gravity_strength * dt if self.gravity else 0
+            moving = [body for body in self.bodies if not body.static and not body.sleeping]
+            for body in moving:
+                body.vy += gravity
+                body.x += body.vx * dt
+                body.y += body.vy * dt
+            if self.collision or self.wall:
+                contacts = []
+                for body1, body2 in self.candidate_pairs():
+                    contact = self.contact(body1, body2)
+                    if contact is not None:
+                        self.wake_contact(body1, body2, *contact)
+                        contacts.append((body1, body2) + contact)
+                # going over the contacts a few times lets a push travel through a pile
+                for iteration in range(self.ITERATIONS):
+                    for contact in contacts:
+                        self.resolve(*contact)
+                # the overlaps are measured again on every pass, a pile pushes apart from the bottom up
+                for iteration in range(self.ITERATIONS):
+                    for contact in contacts:
+                        overlap = self.contact(contact[0], contact[1])
+                        if overlap is not None:
+                            self.separate(contact[0], contact[1], *overlap)
+            if self.boundary:
+                for body in moving:
+                    self.keep_inside(body)
+            # a body in a pile keeps some speed from the solver and wobbles on the spot,
+            # so falling asleep depends on staying near one place for a while
+            sleep_distance = self.SLEEP_DISTANCE * self.SLEEP_DISTANCE
+            for body in moving:
+                anchor = body.anchor
+                if anchor is not None and (body.x - anchor[0]) ** 2 + (body.y - anchor[1]) ** 2 < sleep_distance:
+                    body.rest_time += dt
+                    if body.rest_time > self.SLEEP_TIME:
+                        body.sleeping = True
+                        body.vx = body.vy = 0
+                else:
+                    body.anchor = (body.x, body.y)
+                    body.rest_time = 0
+
+        # sweep and prune: the bodies are sorted by their left edge,
+        # only bodies whose horizontal extents overlap are tested further
+        def candidate_pairs(self):
+            candidates = self.bodies + self.walls if self.wall else [body for body in self.bodies if not body.static]
+            candidates.sort(key=lambda body: body.x)
+            active = []
+            pairs = []
+            for body in candidates:
+                left = body.x
+                active = [other for other in active if other.x + other.width > left]
+                for other in active:
+                    if other.y >= body.y + body.height or body.y >= other.y + other.height:
+                        continue
+                    if (body.static or body.sleeping) and (other.static or other.sleeping):
+                        continue
+                    if not self.collision and not body.static and not other.static:
+                        continue
+                    pairs.append((other, body))
+                active.append(body)
+            self.pairs_tested = len(pairs)
+            return pairs
+
+        # (normal x, normal y, depth) pointing from body1 to body2, or None when they do not touch
+        def contact(self, body1, body2):
+            if body1.shape == "circle" and body2.shape == "circle":
+                (x1, y1), (x2, y2) = body1.center(), body2.center()
+                dx, dy = x2 - x1, y2 - y1
+                distance = math.hypot(dx, dy)
+                radii = body1.radius + body2.radius
+                if distance >= radii:
+                    return None
+                if distance == 0:
+                    return 0, 1, radii
+                return dx / distance, dy / distance, radii - distance
+            if body1.shape == "circle":
+                contact = self.box_circle(body2, body1)
+                return None if contact is None else (-contact[0], -contact[1], contact[2])
+            if body2.shape == "circle":
+                return self.box_circle(body1, body2)
+            (x1, y1), (x2, y2) = body1.center(), body2.center()
+            dx, dy = x2 - x1, y2 - y1
+            overlap_x = (body1.width + body2.width) / 2 - abs(dx)
+            overlap_y = (body1.height + body2.height) / 2 - abs(dy)
+            if overlap_x <= 0 or overlap_y <= 0:
+                return None
+            if overlap_x < overlap_y:
+                return (1 if dx >= 0 else -1), 0, overlap_x
+            return 0, (1 if dy >= 0 else -1), overlap_y
+
+        def box_circle(self, box, circle):
+            cx, cy = circle.center()
+            nearest_x = min(max(cx, box.x), box.x + box.width)
+            nearest_y = min(max(cy, box.y), box.y + box.height)
+            dx, dy = cx - nearest_x, cy - nearest_y
+            distance = math.hypot(dx, dy)
+            if distance >= circle.radius:
+                return None
+            if distance > 0:
+                return dx / distance, dy / distance, circle.radius - distance
+            # the center is inside the box, pushing it out through the nearest side
+            bx, by = box.center()
+            overlap_x = box.width / 2 - abs(cx - bx)
+            overlap_y = box.height / 2 - abs(cy - by)
+            if overlap_x < overlap_y:
+                return (1 if cx >= bx else -1), 0, overlap_x + circle.radius
+            return 0, (1 if cy >= by else -1), overlap_y + circle.radius
+
+        # a body hitting a sleeping one, or squeezed deep into it, wakes it; one settling on it does not
+        def wake_contact(self, body1, body2, nx, ny, depth):
+            if body1.sleeping == body2.sleeping:
+                return
+            awake = body2 if body1.sleeping else body1
+            # a body wobbling in a pile keeps some speed from the solver, it has to be going somewhere
+            hitting = not awake.rest_time and (body1.vx - body2.vx) * nx + (body1.vy - body2.vy) * ny > self.WAKE_SPEED
+            if hitting or depth > self.WAKE_DEPTH:
+                body1.wake()
+                body2.wake()
+
+        def resolve(self, body1, body2, nx, ny, depth):
+            inv1 = 0 if body1.sleeping else body1.inv_mass
+            inv2 = 0 if body2.sleeping else body2.inv_mass
+            total = inv1 + inv2
+            if total == 0:
+                return
+            rvx, rvy = body2.vx - body1.vx, body2.vy - body1.vy
+            normal_speed = rvx * nx + rvy * ny
+            if normal_speed >= 0:
+                return      # already moving apart
+            # slow contacts do not bounce, so that resting bodies settle
+            restitution = min(body1.restitution, body2.restitution) if -normal_speed > 2 * self.gravity_strength * self.step_time else 0
+            j = -(1 + restitution) * normal_speed / total
+            body1.vx -= j * nx * inv1
+            body1.vy -= j * ny * inv1
+            body2.vx += j * nx * inv2
+            body2.vy += j * ny * inv2
+            # friction along the surface, at most friction times the push
+            tx, ty = rvx - normal_speed * nx, rvy - normal_speed * ny
+            length = math.hypot(tx, ty)
+            if length > 1e-9:
+                tx, ty = tx / length, ty / length
+                friction = math.sqrt(body1.friction * body2.friction)
+                jt = max(-j * friction, min(j * friction, -(rvx * tx + rvy * ty) / total))
+                body1.vx -= jt * tx * inv1
+                body1.vy -= jt * ty * inv1
+                body2.vx += jt * tx * inv2
+                body2.vy += jt * ty * inv2
+
+        # pushing overlapping bodies apart
+        def separate(self, body1, body2, nx, ny, depth):
+            inv1 = 0 if body1.sleeping else body1.inv_mass
+            inv2 = 0 if body2.sleeping else body2.inv_mass
+            total = inv1 + inv2
+            if total == 0:
+                return
+            correction = max(depth - self.SLOP, 0) / total * self.CORRECTION
+            body1.x -= correction * nx * inv1
+            body1.y -= correction * ny * inv1
+            body2.x += correction * nx * inv2
+            body2.y += correction * ny * inv2
+
+        def keep_inside(self, body):
+            width, height = self.bounds
+            if body.x < 0:
+                body.x = 0
+                body.vx = abs(body.vx) * body.restitution
+            elif body.x + body.width > width:
+                body.x = width - body.width
+                body.vx = -abs(body.vx) * body.restitution
+            if body.y < 0:
+                body.y = 0
+                body.vy = abs(body.vy) * body.restitution
+            elif body.y + body.height > height:
+                body.y = height - body.height
+                # resting on the bottom instead of bouncing forever in tiny hops
+                body.vy = -abs(body.vy) * body.restitution if body.vy > 2 * self.gravity_strength * self.step_time else 0
+
+    # writes the input of every frame to a binary file
+    # records: 0 a frame (time, held actions as bits, pressed actions), 1 a new action name, 2 the end
+    class inputrecorder:
+        MAGIC = b"SJPREC"
+        VERSION = 1
+
+        def __init__(self, file_path, seed, start):
+            self.file = open(file_path, "wb")
+            self.seed = seed
+            self.indices = {}
+            self.frames = 0
+            self.quit_pressed = False
+            self.file.write(self.MAGIC + struct.pack("<BId", self.VERSION, seed, start))
+
+        def index(self, action):
+            index = self.indices.get(action)
+            if index is None:
+                index = self.indices[action] = len(self.indices)
+                name = action.encode()
+                self.file.write(struct.pack("<BB", 1, len(name)) + name)
+            return index
+
+        def frame(self, now, actions, presses):
+            held = 0
+            for action, state in actions.items():
+                if state:
+                    held |= 1 << self.index(action)
+            pressed = bytes(self.index(action) for action in presses)
+            self.file.write(struct.pack("<BdQB", 0, now, held, len(pressed)) + pressed)
+            self.frames += 1
+            self.quit_pressed = "quit" in presses
+
+        def close(self, checksum):
+            self.file.write(struct.pack("<BII", 2, self.frames, checksum))
+            self.file.close()
+
+    # reads a recording back, one frame at a time
+    class inputreplayer:
+        def __init__(self, file_path):
+            with open(file_path, "rb") as file:
+                data = file.read()
+            magic = sajilopygame.inputrecorder.MAGIC
+            if not data.startswith(magic):
+                raise ValueError("not a sajilopygame recording: " + file_path)
+            version, self.seed, self.start = struct.unpack_from("<BId", data, len(magic))
+            self.records = []       # (time, held action names, pressed action names)
+            self.checksum = None
+            names = []
+            offset = len(magic) + struct.calcsize("<BId")
+            while offset < len(data):
+                kind = data[offset]
+                if kind == 0:
+                    kind, now, held, count = struct.unpack_from("<BdQB", data, offset)
+                    offset += struct.calcsize("<BdQB")
+                    presses = [names[index] for index in data[offset:offset + count]]
+                    offset += count
+                    self.records.append((now, [name for index, name in enumerate(names) if held >> index & 1], presses))
+                elif kind == 1:
+                    length = data[offset + 1]
+                    names.append(data[offset + 2:offset + 2 + length].decode())
+                    offset += 2 + length
+                else:
+                    kind, frames, self.checksum = struct.unpack_from("<BII", data, offset)
+                    break
+            self.position = 0
+            self.frames = 0
+            self.started = time.perf_counter()
+
+        # setting the held actions of the next frame, returns its pressed actions
+        def next_frame(self, game):
+            if self.position >= len(self.records):
+                game.quit()
+            now, held, presses = self.records[self.position]
+            self.position += 1
+            self.frames += 1
+            actions = game.actions
+            for action in actions:
+                actions[action] = False
+            for action in held:
+                actions[action] = True
+            return presses
+
+        # the time of the next frame
+        def next_time(self, current):
+            if self.position < len(self.records):
+                return self.records[self.position][0]
+            return current
@@ -1168,6 +1168,8 @@ def run_code():
     env = os.environ.copy()
     existing_path = env.get("PYTHONPATH", "")
     env["PYTHONPATH"] = library_path + (os.pathsep + existing_path if existing_path else "")
+    # ✅ Physics settings for sajilopygame
+    env["SAJILOPYTHON_PHYSICS"] = json.dumps(config.get("physics", {}))
 
     CREATE_NO_WINDOW = 0x08000000
     proc = subprocess.Popen([interpreter, path], env=env, creationflags=CREATE_NO_WINDOW, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)